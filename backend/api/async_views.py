@@ -0,0 +1,119 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_cache_control
+from recipes.versions import aget_version
+
+from .middleware import SAFE_METHODS
+from .mixins import is_not_modified, versioned_etag, versioned_payloads
+from .utils import feed_cache, ingredient_index
+from .utils.workers import run_in_pool
+from .views import IngredientsViewSet, RecipeViewSet, TagsViewSet
+
+recipe_list_view = RecipeViewSet.as_view({'get': 'list', 'post': 'create'})
+recipe_detail_view = RecipeViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+})
+tag_list_view = TagsViewSet.as_view({'get': 'list'})
+ingredient_list_view = IngredientsViewSet.as_view({'get': 'list'})
+
+
+def call_view(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    response.render()
+    return response
+
+
+async def in_pool(view, request, *args, **kwargs):
+    """
+    Синхронная DRF-вью: чтение - в пуле потоков для чтения,
+    изменения - как обычная синхронная вью Django, чтобы запись
+    не занимала пул, рассчитанный на чтение.
+    """
+    if request.method not in SAFE_METHODS:
+        return await sync_to_async(call_view, thread_sensitive=True)(
+            view, request, *args, **kwargs)
+    return await run_in_pool(
+        lambda: call_view(view, request, *args, **kwargs))
+
+
+def accepts_json(request):
+    """
+    Быстрый путь отдаёт только JSON; браузерный API DRF
+    и явный выбор формата обслуживает сама DRF-вью.
+    """
+    return (request.method == 'GET' and 'format' not in request.GET
+            and 'html' not in request.headers.get('Accept', ''))
+
+
+def json_response(data):
+    return JsonResponse(
+        data, safe=False, json_dumps_params={'ensure_ascii': False})
+
+
+async def versioned_list(request, name, view):
+    """
+    Список с версией: 304 и готовые данные из памяти процесса
+    отдаются без обращения к базе, иначе работает DRF-вью.
+    """
+    if not accepts_json(request):
+        return await in_pool(view, request)
+    version = await aget_version(name)
+    if version is None:
+        return await in_pool(view, request)
+    etag = versioned_etag(name, version)
+    if is_not_modified(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        cached = versioned_payloads.get(name)
+        if cached is None or cached[0] != version:
+            return await in_pool(view, request)
+        response = json_response(cached[1])
+    response['ETag'] = etag
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
+
+
+async def tag_list(request):
+    return await versioned_list(request, 'tags', tag_list_view)
+
+
+async def ingredient_list(request):
+    name = request.GET.get('name')
+    if not name:
+        return await versioned_list(
+            request, 'ingredients', ingredient_list_view)
+    if not accepts_json(request):
+        return await in_pool(ingredient_list_view, request)
+    index = ingredient_index.get_cached(await aget_version('ingredients'))
+    if index is None:
+        return await in_pool(ingredient_list_view, request)
+    return json_response(
+        index.search(name, IngredientsViewSet.search_limit))
+
+
+async def recipe_list(request):
+    """
+    Анонимная лента из кеша отдаётся прямо из цикла событий,
+    остальные запросы выполняет RecipeViewSet в пуле потоков.
+    """
+    if accepts_json(request) and 'Authorization' not in request.headers:
+        key = await feed_cache.aget_cache_key(request)
+        if key is not None:
+            data = await feed_cache.aload(key)
+            if data is not None:
+                return json_response(data)
+    return await in_pool(recipe_list_view, request)
+
+
+async def recipe_detail(request, pk):
+    return await in_pool(recipe_detail_view, request, pk=pk)
+
+
+# Как и DRF-вью, API авторизуется токеном, а не сессией. Декоратор
+# csrf_exempt в Django 4.0 превращает корутину в обычную функцию,
+# поэтому атрибут ставится напрямую.
+for view in (tag_list, ingredient_list, recipe_list, recipe_detail):
+    view.csrf_exempt = True
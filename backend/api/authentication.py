@@ -0,0 +1,58 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from recipes.versions import is_shared_cache
+from rest_framework.authentication import TokenAuthentication
+
+USER_KEY = 'auth-token-user:{}'
+
+
+def token_cache_key(key):
+    digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+    return f'auth-token:{digest}'
+
+
+def forget_token(key):
+    cache.delete(token_cache_key(key))
+
+
+def forget_user(user_id):
+    """
+    Сбрасывает закешированный токен пользователя, не обращаясь к базе:
+    ключ токена запоминается рядом с записью кеша.
+    """
+    user_key = USER_KEY.format(user_id)
+    key = cache.get(user_key)
+    if key is not None:
+        cache.delete_many([token_cache_key(key), user_key])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication, который кеширует пользователя по токену
+    на TOKEN_CACHE_TIMEOUT секунд. Запись сбрасывается сигналами
+    при удалении токена (выход) и при сохранении пользователя
+    (смена пароля, деактивация, смена роли).
+    Сброс виден другим процессам только через общий кеш, поэтому
+    с локальным кешем процесса работает как TokenAuthentication.
+    Счётчики пользователя в кеш не попадают: они отложены
+    и читаются из базы при обращении.
+    """
+
+    def authenticate_credentials(self, key):
+        if not is_shared_cache():
+            return super().authenticate_credentials(key)
+        cache_key = token_cache_key(key)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        user, token = super().authenticate_credentials(key)
+        # Поле без значения в __dict__ Django считает отложенным
+        for field in user.counter_fields:
+            user.__dict__.pop(field, None)
+        cache.set_many({
+            cache_key: (user, token),
+            USER_KEY.format(user.pk): key,
+        }, settings.TOKEN_CACHE_TIMEOUT)
+        return user, token
@@ -0,0 +1,38 @@
+import os
+
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+from recipes.versions import is_shared_cache
+
+
+@register()
+def check_replica_pin(app_configs, **kwargs):
+    """
+    Метка read-your-writes для клиентов без кук хранится в кеше.
+    """
+    if not settings.DATABASE_REPLICAS or is_shared_cache():
+        return []
+    return [Warning(
+        'Заданы реплики (DB_REPLICAS), но кеш локален для процесса: '
+        'клиенты без кук после изменений могут читать устаревшие данные '
+        'с реплик.',
+        hint='Укажите общий кеш в CACHE_BACKEND и CACHE_LOCATION '
+             '(redis, memcached).',
+        id='api.W001',
+    )]
+
+
+@register()
+def check_private_media_root(app_configs, **kwargs):
+    """
+    Закрытые файлы не должны попасть в раздаваемый nginx MEDIA_ROOT.
+    """
+    private = os.path.realpath(settings.PRIVATE_MEDIA_ROOT)
+    media = os.path.realpath(settings.MEDIA_ROOT)
+    if os.path.commonpath([private, media]) not in (private, media):
+        return []
+    return [Error(
+        'PRIVATE_MEDIA_ROOT и MEDIA_ROOT не должны быть вложены '
+        'друг в друга: списки покупок станут доступны без авторизации.',
+        id='api.E001',
+    )]
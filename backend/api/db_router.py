@@ -0,0 +1,34 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+# Включается ReplicaRoutingMiddleware для безопасных запросов
+use_replica = ContextVar('use_replica', default=False)
+
+# Аутентификация всегда читает с основной базы: токен, выданный
+# только что при входе, мог ещё не доехать до реплики
+PRIMARY_ONLY = {'authtoken.token'}
+
+
+class ReplicaRouter:
+    """
+    Чтение в безопасных запросах уходит на случайную реплику
+    из DATABASE_REPLICAS, запись и всё остальное - на default.
+    """
+
+    def db_for_read(self, model, **hints):
+        if (use_replica.get() and settings.DATABASE_REPLICAS
+                and model._meta.label_lower not in PRIMARY_ONLY):
+            return random.choice(settings.DATABASE_REPLICAS)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
@@ -1,7 +1,29 @@
+from django.db.models import Exists, OuterRef
 from django_filters import rest_framework as filters
-from recipes.models import Recipe
+from recipes.models import Recipe, Tag
+from recipes.versions import get_version
 from rest_framework.filters import SearchFilter
 
+_tag_ids = (None, {})
+
+
+def get_tag_ids():
+    """
+    Словарь {slug: id} тегов, закешированный в процессе
+    до смены версии тегов. Без версии читается из базы.
+    """
+    global _tag_ids
+    version = get_version('tags')
+    if version is None:
+        return dict(Tag.objects.values_list('slug', 'id'))
+    if _tag_ids[0] != version:
+        _tag_ids = (version, dict(Tag.objects.values_list('slug', 'id')))
+    return _tag_ids[1]
+
+
+def get_tag_choices():
+    return [(slug, slug) for slug in get_tag_ids()]
+
 
 class RecipeFilter(filters.FilterSet):
     """
@@ -11,14 +33,19 @@ class RecipeFilter(filters.FilterSet):
         method='get_favorite',
         label='favorite',
     )
-    tags = filters.AllValuesMultipleFilter(
-        field_name='tags__slug',
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices,
+        method='get_tags',
         label='tags',
     )
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart',
         label='shopping_cart',
     )
+    search = filters.CharFilter(
+        method='get_search',
+        label='search',
+    )
 
     class Meta:
         model = Recipe
@@ -27,8 +54,22 @@ class RecipeFilter(filters.FilterSet):
             'author',
             'is_favorited',
             'is_in_shopping_cart',
+            'search',
         )
 
+    def get_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        # Тег мог быть удалён после проверки выбора: такие слаги
+        # ничему не соответствуют и пропускаются
+        tag_ids = get_tag_ids()
+        return queryset.filter(Exists(Recipe.tags.through.objects.filter(
+            recipe=OuterRef('pk'),
+            tag_id__in=[
+                tag_ids[slug] for slug in value if slug in tag_ids
+            ],
+        )))
+
     def get_favorite(self, queryset, name, value):
         if value:
             return queryset.filter(favorites__user=self.request.user)
@@ -39,6 +80,11 @@ class RecipeFilter(filters.FilterSet):
             return queryset.filter(cart__user=self.request.user)
         return queryset
 
+    def get_search(self, queryset, name, value):
+        if value.strip():
+            return queryset.search(value)
+        return queryset
+
 
 class IngredientsSearchFilter(SearchFilter):
     """
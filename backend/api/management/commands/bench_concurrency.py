@@ -0,0 +1,266 @@
+import asyncio
+import io
+import json
+import statistics
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from recipes.models import Ingredient, Recipe
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+from api.management.commands.bench_endpoints import percentile
+
+HOST = 'localhost'
+MODES = {
+    # режим: (сервер, URLconf)
+    'wsgi': ('wsgi', 'backend.urls'),
+    'asgi-sync': ('asgi', 'backend.urls'),
+    'asgi': ('asgi', 'backend.asgi_urls'),
+}
+
+
+class DatabaseLatency:
+    """
+    Задержка перед каждым запросом к базе, как у сетевой СУБД.
+    Подключается к каждому новому соединению в любом потоке.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        time.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+    def attach(self, sender, connection, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+class Load:
+    """
+    Очередь из requests запросов по кругу по списку путей
+    и замеры времени ответа.
+    """
+
+    def __init__(self, paths, requests):
+        self.paths = paths
+        self.remaining = requests
+        self.lock = threading.Lock()
+        self.timings = []
+        self.errors = 0
+
+    def next_path(self):
+        with self.lock:
+            if self.remaining <= 0:
+                return None
+            self.remaining -= 1
+            return self.paths[self.remaining % len(self.paths)]
+
+    def done(self, start, status):
+        with self.lock:
+            self.timings.append((time.perf_counter() - start) * 1000)
+            if status >= 400:
+                self.errors += 1
+
+
+def split(path):
+    path, _, query = path.partition('?')
+    return path, query
+
+
+def run_wsgi(load, clients, workers, headers):
+    """
+    Клиенты в потоках, семафор ограничивает число одновременно
+    обрабатываемых запросов, как потоки синхронного воркера.
+    """
+    handler = WSGIHandler()
+    worker = threading.BoundedSemaphore(workers)
+
+    def client():
+        while True:
+            path = load.next_path()
+            if path is None:
+                return
+            path_info, query = split(path)
+            environ = {
+                'REQUEST_METHOD': 'GET',
+                'PATH_INFO': path_info,
+                'QUERY_STRING': query,
+                'SCRIPT_NAME': '',
+                'SERVER_NAME': HOST,
+                'SERVER_PORT': '80',
+                'HTTP_HOST': HOST,
+                'wsgi.input': io.BytesIO(),
+                'wsgi.url_scheme': 'http',
+                **{
+                    'HTTP_' + name.upper().replace('-', '_'): value
+                    for name, value in headers.items()
+                },
+            }
+            statuses = []
+            start = time.perf_counter()
+            with worker:
+                response = handler(
+                    environ, lambda status, _: statuses.append(status))
+                for _ in response:
+                    pass
+                response.close()
+            load.done(start, int(statuses[0].split()[0]))
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+async def run_asgi(load, clients, headers):
+    """
+    Клиенты - задачи в одном цикле событий, как у воркера uvicorn.
+    """
+    application = ASGIHandler()
+    raw_headers = [(b'host', HOST.encode())] + [
+        (name.lower().encode(), value.encode())
+        for name, value in headers.items()
+    ]
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def client():
+        while True:
+            path = load.next_path()
+            if path is None:
+                return
+            path_info, query = split(path)
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': path_info,
+                'raw_path': path_info.encode(),
+                'query_string': query.encode(),
+                'root_path': '',
+                'headers': raw_headers,
+                'client': ('127.0.0.1', 0),
+                'server': (HOST, 80),
+            }
+            messages = []
+
+            async def send(message):
+                messages.append(message)
+
+            start = time.perf_counter()
+            await application(scope, receive, send)
+            load.done(start, messages[0]['status'])
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+
+
+class Command(BaseCommand):
+    """
+    Сравнение WSGI и ASGI под конкурентной нагрузкой в одном процессе.
+    wsgi - синхронный воркер (по умолчанию один запрос за раз),
+    asgi-sync - ASGI с обычными DRF-вью, asgi - ASGI с async-вью
+    из backend.asgi_urls. --db-latency добавляет задержку к каждому
+    запросу к базе, чтобы на SQLite было видно ожидание сетевой СУБД.
+    Нужны данные в базе (seed_foodgram); для пользователя создаётся токен.
+    """
+    help = 'compare WSGI and ASGI throughput on the hot read endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=32)
+        parser.add_argument('--requests', type=int, default=256)
+        parser.add_argument('--wsgi-threads', type=int, default=1,
+                            help='requests a WSGI worker handles at once')
+        parser.add_argument('--db-latency', type=float, default=5.0,
+                            help='simulated milliseconds per SQL query')
+        parser.add_argument('--modes', nargs='+', choices=MODES,
+                            default=list(MODES))
+        parser.add_argument('--anonymous', action='store_true',
+                            help='send requests without a token')
+        parser.add_argument('--output', help='write the json report here')
+
+    @staticmethod
+    def get_paths():
+        recipe = Recipe.objects.order_by('-pub_date').first()
+        ingredient = Ingredient.objects.first()
+        if recipe is None or ingredient is None:
+            raise CommandError('Нет данных: запустите seed_foodgram')
+        return [
+            '/api/recipes/?limit=6',
+            f'/api/recipes/{recipe.id}/',
+            '/api/tags/',
+            '/api/ingredients/?' + urlencode({'name': ingredient.name[:2]}),
+        ]
+
+    @staticmethod
+    def get_headers(anonymous):
+        if anonymous:
+            return {}
+        user = User.objects.filter(is_active=True).first()
+        token, _ = Token.objects.get_or_create(user=user)
+        return {'Authorization': f'Token {token.key}'}
+
+    def measure(self, mode, paths, headers, options):
+        server, urlconf = MODES[mode]
+        load = Load(paths, options['requests'])
+        start = time.perf_counter()
+        with override_settings(ROOT_URLCONF=urlconf):
+            if server == 'wsgi':
+                run_wsgi(load, options['clients'], options['wsgi_threads'],
+                         headers)
+            else:
+                asyncio.run(run_asgi(load, options['clients'], headers))
+        elapsed = time.perf_counter() - start
+        return {
+            'mode': mode,
+            'requests': len(load.timings),
+            'errors': load.errors,
+            'rps': round(len(load.timings) / elapsed, 1),
+            'p50_ms': round(statistics.median(load.timings), 2),
+            'p99_ms': round(percentile(load.timings, 0.99), 2),
+        }
+
+    def handle(self, *args, **options):
+        if min(options['clients'], options['requests'],
+               options['wsgi_threads']) < 1:
+            raise CommandError(
+                '--clients, --requests и --wsgi-threads должны быть больше 0')
+        paths = self.get_paths()
+        headers = self.get_headers(options['anonymous'])
+        latency = DatabaseLatency(options['db_latency'] / 1000)
+        if options['db_latency'] > 0:
+            connection_created.connect(latency.attach)
+            connection.close()
+        results = []
+        self.stdout.write(f'{"mode":<10} {"req/s":>8} {"p50 ms":>9} '
+                          f'{"p99 ms":>9} errors')
+        try:
+            for mode in options['modes']:
+                result = self.measure(mode, paths, headers, options)
+                results.append(result)
+                self.stdout.write(
+                    f'{mode:<10} {result["rps"]:>8} {result["p50_ms"]:>9} '
+                    f'{result["p99_ms"]:>9} {result["errors"]}')
+        finally:
+            connection_created.disconnect(latency.attach)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({
+                    'paths': paths,
+                    'clients': options['clients'],
+                    'db_latency_ms': options['db_latency'],
+                    'results': results,
+                }, file, ensure_ascii=False, indent=2)
@@ -0,0 +1,279 @@
+import json
+import logging
+import math
+import re
+import statistics
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.urls import URLResolver, get_resolver
+from recipes.models import Ingredient, Recipe, Tag
+from recipes.seeding import seed
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import User
+
+PREFIX = '/api/'
+GROUP = re.compile(r'\(\?P<(\w+)>[^)]*\)|<(?:\w+:)?(\w+)>')
+# Маршруты с суффиксом формата дублируют основные
+FORMAT_SUFFIX = r'\.(?P<format>'
+# Параметры, с которыми списки запрашивает фронтенд
+QUERY_PARAMS = {'limit': 6, 'recipes_limit': 3}
+PK_BY_BASENAME = {
+    'recipes': 'recipe',
+    'ingredients': 'ingredient',
+    'tags': 'tag',
+}
+
+
+def iter_routes(patterns, prefix=''):
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from iter_routes(
+                pattern.url_patterns, prefix + str(pattern.pattern))
+        else:
+            yield prefix + str(pattern.pattern), pattern.callback
+
+
+def get_methods(callback):
+    actions = getattr(callback, 'actions', None)
+    if actions is not None:
+        return set(actions)
+    view_class = getattr(callback, 'cls', None)
+    return {
+        method for method in getattr(view_class, 'http_method_names', ())
+        if method != 'options' and hasattr(view_class, method)
+    }
+
+
+def build_path(route, values):
+    """
+    Подставляет значения параметров в маршрут.
+    Возвращает None, если маршрут не удалось превратить в путь.
+    """
+    path = route.replace('^', '').replace('$', '').replace('/?', '/')
+    path = GROUP.sub(lambda match: str(values.get(
+        match.group(1) or match.group(2), match.group(0))), path)
+    if re.search(r'[()<>?\\\[\]*+|]', path):
+        return None
+    return PREFIX + path
+
+
+class QueryCounter:
+    """
+    Счётчик запросов к базе. CaptureQueriesContext здесь не подходит:
+    тестовый клиент шлёт request_started, и журнал запросов сбрасывается.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class Endpoint:
+    """
+    Эндпоинт для замера.
+    Для маршрутов без GET, принимающих POST и DELETE (избранное,
+    корзина, подписка), замеряется пара запросов: добавить и удалить.
+    """
+
+    def __init__(self, route, path, methods):
+        self.route = route
+        self.path = path
+        self.methods = methods
+
+    @property
+    def name(self):
+        return f'{"+".join(self.methods).upper()} {self.path}'
+
+    def call(self, client):
+        responses = [
+            getattr(client, method)(
+                self.path, QUERY_PARAMS if method == 'get' else None)
+            for method in self.methods
+        ]
+        size = 0
+        for response in responses:
+            if response.streaming:
+                size += sum(len(chunk) for chunk in
+                            response.streaming_content)
+            else:
+                size += len(response.content)
+        return [response.status_code for response in responses], size
+
+
+class Command(BaseCommand):
+    """
+    Замер всех маршрутов api/urls.py через тестовый клиент Django:
+    p50/p99 времени ответа, число запросов к базе и размер ответа.
+    Всё выполняется в транзакции, которая откатывается после замера,
+    поэтому добавления в избранное и корзину не остаются в базе.
+    """
+    help = 'benchmark every api route and write the results as json'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20,
+                            help='timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--users', type=int, default=0,
+                            help='seed N users before the run')
+        parser.add_argument('--recipes', type=int, default=0,
+                            help='seed N recipes before the run')
+        parser.add_argument('--anonymous', action='store_true',
+                            help='send requests without a token')
+        parser.add_argument('--only', default='',
+                            help='benchmark only paths containing this text')
+        parser.add_argument('--label', default='',
+                            help='label stored in the report, e.g. a commit')
+        parser.add_argument('--output', help='write the json report here')
+        parser.add_argument('--compare',
+                            help='print the difference with a json report')
+
+    @staticmethod
+    def get_values():
+        user = User.objects.filter(is_active=True).annotate(
+            count=Count('cart')).order_by('-count', 'id').first()
+        recipe = Recipe.objects.exclude(author=user).exclude(
+            favorites__user=user).exclude(cart__user=user).order_by(
+                '-pub_date').first()
+        author = User.objects.exclude(id=user.id).exclude(
+            following__user=user).annotate(
+                count=Count('recipes')).order_by('-count', 'id').first()
+        if recipe is None or author is None:
+            raise CommandError(
+                'Недостаточно данных: запустите seed_foodgram '
+                'или передайте --users и --recipes')
+        return user, {
+            'recipe': recipe.id,
+            'ingredient': Ingredient.objects.values_list(
+                'id', flat=True).first(),
+            'tag': Tag.objects.values_list('id', flat=True).first(),
+            'id': author.id,
+            'user_id': author.id,
+            'format': '.json',
+        }
+
+    @staticmethod
+    def get_endpoints(values, only):
+        endpoints = {}
+        for route, callback in iter_routes(
+                get_resolver('api.urls').url_patterns):
+            if FORMAT_SUFFIX in route:
+                continue
+            basename = getattr(callback, 'initkwargs', {}).get('basename')
+            route_values = dict(values)
+            if basename in PK_BY_BASENAME:
+                route_values['pk'] = values[PK_BY_BASENAME[basename]]
+            path = build_path(route, route_values)
+            methods = get_methods(callback)
+            if 'get' in methods:
+                methods = ('get',)
+            elif {'post', 'delete'} <= methods and GROUP.search(route):
+                methods = ('post', 'delete')
+            else:
+                continue
+            if path is None or only not in path:
+                continue
+            # Первый подходящий маршрут перекрывает остальные
+            endpoints.setdefault((path, methods),
+                                 Endpoint(route, path, methods))
+        return list(endpoints.values())
+
+    @staticmethod
+    def measure(client, endpoint, options):
+        for _ in range(options['warmup']):
+            endpoint.call(client)
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries):
+            statuses, size = endpoint.call(client)
+        timings = []
+        for _ in range(options['requests']):
+            start = time.perf_counter()
+            endpoint.call(client)
+            timings.append((time.perf_counter() - start) * 1000)
+        return {
+            'name': endpoint.name,
+            'route': endpoint.route,
+            'status': statuses,
+            'queries': queries.count,
+            'size': size,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+        }
+
+    def run(self, options):
+        if options['users'] or options['recipes']:
+            seed(users=options['users'], recipes=options['recipes'])
+        user, values = self.get_values()
+        client = APIClient(HTTP_HOST='localhost')
+        if not options['anonymous']:
+            token, _ = Token.objects.get_or_create(user=user)
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        results = []
+        for endpoint in self.get_endpoints(values, options['only']):
+            result = self.measure(client, endpoint, options)
+            results.append(result)
+            self.stdout.write(
+                f'{result["name"]:<55} {result["p50_ms"]:>9.2f} '
+                f'{result["p99_ms"]:>9.2f} {result["queries"]:>4} '
+                f'{result["size"]:>9} {result["status"]}')
+        return {
+            'label': options['label'],
+            'created': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'anonymous': options['anonymous'],
+            'requests': options['requests'],
+            'users': User.objects.count(),
+            'recipes': Recipe.objects.count(),
+            'endpoints': results,
+        }
+
+    def compare(self, report, filename):
+        with open(filename, encoding='utf-8') as file:
+            baseline = {
+                result['name']: result
+                for result in json.load(file)['endpoints']
+            }
+        for result in report['endpoints']:
+            before = baseline.get(result['name'])
+            if before is None:
+                continue
+            change = (result['p50_ms'] - before['p50_ms']) / max(
+                before['p50_ms'], 0.001) * 100
+            queries = result['queries'] - before['queries']
+            line = f'{result["name"]:<55} {change:>+8.1f}% {queries:>+4}'
+            style = (self.style.ERROR if queries > 0 or change > 20
+                     else self.style.SUCCESS)
+            self.stdout.write(style(line))
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests должен быть больше 0')
+        self.stdout.write(f'{"endpoint":<55} {"p50 ms":>9} {"p99 ms":>9} '
+                          f'{"sql":>4} {"bytes":>9} status')
+        # Ответы 4xx при --anonymous ожидаемы и только засоряют вывод
+        logger = logging.getLogger('django.request')
+        level = logger.level
+        logger.setLevel(logging.ERROR)
+        try:
+            with transaction.atomic():
+                report = self.run(options)
+                transaction.set_rollback(True)
+        finally:
+            logger.setLevel(level)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if options['compare']:
+            self.compare(report, options['compare'])
@@ -0,0 +1,75 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.models import Ingredient
+
+from api.utils.ingredient_index import IngredientPrefixIndex
+
+ALPHABET = 'абвгдеёжзийклмнопрстуфхцчшщэюя'
+
+
+class Command(BaseCommand):
+    """
+    Сравнение поиска ингредиентов по префиксу: индекс в памяти и ORM.
+    Каталог создаётся внутри транзакции и откатывается после замера.
+    """
+    help = 'benchmark ingredient prefix search: in-memory index vs ORM'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=50)
+        parser.add_argument('--seed', type=int, default=0)
+
+    @staticmethod
+    def measure(function, prefixes):
+        start = time.perf_counter()
+        for prefix in prefixes:
+            function(prefix)
+        return (time.perf_counter() - start) / len(prefixes) * 1000
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        names = {
+            ''.join(generator.choices(ALPHABET, k=generator.randint(4, 16)))
+            for _ in range(options['size'])
+        }
+        prefixes = [
+            ''.join(generator.choices(ALPHABET, k=generator.randint(1, 3)))
+            for _ in range(options['queries'])
+        ]
+        limit = options['limit']
+        with transaction.atomic():
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit='г')
+                 for name in names),
+                batch_size=5000,
+            )
+            start = time.perf_counter()
+            index = IngredientPrefixIndex(Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit').iterator())
+            build = (time.perf_counter() - start) * 1000
+            orm = self.measure(
+                lambda prefix: list(Ingredient.objects.filter(
+                    name__istartswith=prefix
+                ).values('id', 'name', 'measurement_unit')),
+                prefixes,
+            )
+            orm_limited = self.measure(
+                lambda prefix: list(Ingredient.objects.filter(
+                    name__istartswith=prefix
+                ).values('id', 'name', 'measurement_unit')[:limit]),
+                prefixes,
+            )
+            indexed = self.measure(
+                lambda prefix: index.search(prefix, limit), prefixes)
+            transaction.set_rollback(True)
+        self.stdout.write(
+            f'Каталог: {len(index)} ингредиентов, '
+            f'построение индекса {build:.0f} мс\n'
+            f'ORM: {orm:.2f} мс на запрос\n'
+            f'ORM, первые {limit}: {orm_limited:.2f} мс на запрос\n'
+            f'Индекс, первые {limit}: {indexed:.4f} мс на запрос'
+        )
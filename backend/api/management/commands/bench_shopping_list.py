@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.utils.shopping_list import get_shopping_cart
+
+
+class Command(BaseCommand):
+    """
+    Замер времени выгрузки списка покупок.
+    """
+    help = 'benchmark shopping list rendering for every file format'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lines', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--formats', nargs='+',
+                            default=['txt', 'csv', 'pdf'])
+
+    def handle(self, *args, **options):
+        ingredients = [
+            (f'Ингредиент {number}', 'г', number % 1000 + 1)
+            for number in range(options['lines'])
+        ]
+        for file_format in options['formats']:
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                response = get_shopping_cart(iter(ingredients), file_format)
+                size = sum(len(chunk) for chunk in response)
+                timings.append(time.perf_counter() - start)
+            timings.sort()
+            self.stdout.write(
+                f'{file_format}: {options["lines"]} строк, '
+                f'{size} байт, min {timings[0] * 1000:.1f} мс, '
+                f'median {timings[len(timings) // 2] * 1000:.1f} мс'
+            )
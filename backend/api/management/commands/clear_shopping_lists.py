@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from recipes.models import ShoppingListJob
+
+from api.utils.shopping_list import STORAGE_DIR, private_storage
+
+
+class Command(BaseCommand):
+    """
+    Удаление готовых списков покупок старше --days дней
+    и устаревших задач выгрузки.
+    Файлы называются по хешу корзины, и после её изменения старые
+    больше не запрашиваются. Запускается периодически, например из cron.
+    """
+    help = 'delete stored shopping lists older than --days and expired jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=1)
+
+    @staticmethod
+    def delete_files(storage, since):
+        if not storage.exists(STORAGE_DIR):
+            return 0
+        _, files = storage.listdir(STORAGE_DIR)
+        deleted = 0
+        for filename in files:
+            name = f'{STORAGE_DIR}/{filename}'
+            if storage.get_modified_time(name) < since:
+                storage.delete(name)
+                deleted += 1
+        return deleted
+
+    def handle(self, *args, **options):
+        if options['days'] < 0:
+            raise CommandError('--days не может быть меньше 0')
+        now = timezone.now()
+        deleted = self.delete_files(
+            private_storage(), now - timedelta(days=options['days']))
+        jobs, _ = ShoppingListJob.objects.filter(
+            created__lt=now - timedelta(
+                seconds=settings.SHOPPING_LIST_JOB_TIMEOUT)).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено файлов: {deleted}, задач: {jobs}'))
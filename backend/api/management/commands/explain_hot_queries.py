@@ -0,0 +1,270 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.http import QueryDict
+from django.test import RequestFactory
+from recipes import timeline
+from recipes.models import (Cart, CartIngredient, Favorite, Recipe,
+                            RecipeIngredient, Tag, TimelineEntry)
+from recipes.seeding import seed
+from users.models import Follow, User
+
+from api.filters import RecipeFilter
+from api.views import FollowListView
+
+PAGE = 6
+
+
+class HotQuery:
+    """
+    Запрос, стоящий за эндпоинтом API.
+    allow_sort - допускается сортировка без индекса (маленькие выборки),
+    allow_scan - таблицы или алиасы, которые можно читать целиком.
+    """
+
+    def __init__(self, name, build, allow_sort=False, allow_scan=()):
+        self.name = name
+        self.build = build
+        self.allow_sort = allow_sort
+        self.allow_scan = set(allow_scan)
+
+
+def subscriptions(context):
+    request = RequestFactory().get('/', {'recipes_limit': 3})
+    request.user = context['user']
+    view = FollowListView()
+    view.request = request
+    return view.get_queryset()[:PAGE]
+
+
+def subscription_recipes(context):
+    authors = User.objects.filter(
+        following__user=context['user']).values_list('id', flat=True)
+    return Recipe.objects.filter(
+        author__in=list(authors[:PAGE]),
+        id__in=Subquery(Recipe.objects.filter(
+            author=OuterRef('author')).values('id')[:3]),
+    ).only('id', 'name', 'image', 'image_thumbnail', 'cooking_time',
+           'author')
+
+
+def tag_filter(context):
+    return RecipeFilter(
+        data=QueryDict(f'tags={context["tag"]}'),
+        queryset=Recipe.objects.with_user_data(context['user']),
+    ).qs[:PAGE]
+
+
+HOT_QUERIES = (
+    HotQuery(
+        'recipes: list',
+        lambda context: Recipe.objects.with_user_data(
+            context['user']).order_by('-pub_date', '-id')[:PAGE],
+    ),
+    HotQuery(
+        'recipes: list by cursor',
+        lambda context: Recipe.objects.with_user_data(
+            context['user']).filter(
+                pub_date__lt=context['pub_date']
+        ).order_by('-pub_date', '-id')[:PAGE],
+    ),
+    HotQuery(
+        'recipes: list by author',
+        lambda context: Recipe.objects.with_user_data(
+            context['user']).filter(
+                author=context['author']
+        ).order_by('-pub_date', '-id')[:PAGE],
+    ),
+    HotQuery('recipes: list by tag', tag_filter),
+    HotQuery(
+        'recipes: search',
+        lambda context: Recipe.objects.with_user_data(
+            context['user']).search(context['word'])[:PAGE],
+        # сортировка по релевантности только среди найденных,
+        # FTS5 читается через свой индекс (INDEX 0:M)
+        allow_sort=True,
+        allow_scan={'recipes_recipe_fts'},
+    ),
+    HotQuery(
+        'recipes: feed timeline',
+        lambda context: TimelineEntry.objects.filter(
+            user=context['user']).order_by(
+                '-pub_date', '-recipe_id').values_list(
+                    'pub_date', 'recipe_id')[:PAGE],
+    ),
+    HotQuery(
+        'recipes: feed popular authors',
+        lambda context: timeline.pulled(context['user'].id).order_by(
+            '-pub_date', '-id').values_list('pub_date', 'id')[:PAGE],
+        allow_sort=True,
+    ),
+    HotQuery(
+        'recipes: popular',
+        lambda context: Recipe.objects.with_user_data(
+            context['user']).filter(popularity__isnull=False).order_by(
+                'popularity__rank')[:PAGE],
+        allow_scan={'recipes_popularrecipe'},
+    ),
+    HotQuery(
+        'recipes: popular fallback',
+        lambda context: Recipe.objects.with_user_data(
+            context['user']).order_by(
+                '-favorites_count', '-in_carts_count', '-id')[:PAGE],
+    ),
+    HotQuery(
+        'recipes: list favorited',
+        lambda context: Recipe.objects.with_user_data(
+            context['user']).filter(
+                favorites__user=context['user'])[:PAGE],
+        allow_sort=True,
+    ),
+    HotQuery(
+        'recipes: list in shopping cart',
+        lambda context: Recipe.objects.with_user_data(
+            context['user']).filter(cart__user=context['user'])[:PAGE],
+        allow_sort=True,
+    ),
+    HotQuery(
+        'recipes: prefetch tags',
+        lambda context: Tag.objects.filter(
+            recipes__in=context['recipe_ids']),
+        allow_sort=True,
+    ),
+    HotQuery(
+        'recipes: prefetch ingredients',
+        lambda context: RecipeIngredient.objects.filter(
+            recipe__in=context['recipe_ids']).select_related('ingredient'),
+        allow_sort=True,
+    ),
+    HotQuery('subscriptions: authors', subscriptions, allow_sort=True),
+    HotQuery(
+        'subscriptions: recipes', subscription_recipes, allow_sort=True),
+    HotQuery(
+        'subscriptions: followers of author',
+        lambda context: Follow.objects.filter(author=context['author']),
+    ),
+    HotQuery(
+        'favorite: toggle',
+        lambda context: Favorite.objects.filter(
+            user=context['user'], recipe=context['recipe']),
+    ),
+    HotQuery(
+        'favorite: by recipe',
+        lambda context: Favorite.objects.filter(recipe=context['recipe']),
+    ),
+    HotQuery(
+        'shopping cart: by recipe',
+        lambda context: Cart.objects.filter(
+            recipe=context['recipe']).values_list('user_id', flat=True),
+    ),
+    HotQuery(
+        'shopping cart: download',
+        lambda context: CartIngredient.objects.filter(
+            user=context['user'], amount__gt=0).values_list(
+                'ingredient__name', 'ingredient__measurement_unit',
+                'amount'),
+        allow_sort=True,
+    ),
+)
+
+SQLITE_SCAN = re.compile(r'\bSCAN (\S+)(?! USING)(?:\s|$)')
+SQLITE_SORT = re.compile(r'USE TEMP B-TREE FOR (?:ORDER BY|RIGHT PART OF)')
+POSTGRES_SCAN = re.compile(r'Seq Scan on (\S+)')
+POSTGRES_SORT = re.compile(r'(?:^|->\s+)Sort\b', re.MULTILINE)
+
+
+def find_problems(plan, hot_query):
+    """
+    Полные просмотры таблиц и сортировки без индекса в плане запроса.
+    """
+    if connection.vendor == 'postgresql':
+        scan, sort = POSTGRES_SCAN, POSTGRES_SORT
+    else:
+        scan, sort = SQLITE_SCAN, SQLITE_SORT
+    problems = [
+        f'полный просмотр {table}'
+        for line in plan.splitlines()
+        for table in scan.findall(line)
+        if 'USING' not in line and table not in hot_query.allow_scan
+    ]
+    if not hot_query.allow_sort and sort.search(plan):
+        problems.append('сортировка без индекса')
+    return problems
+
+
+class Command(BaseCommand):
+    """
+    Проверка планов запросов горячих эндпоинтов.
+    Наполняет базу данными, снимает EXPLAIN и падает,
+    если запрос читает таблицу целиком или сортирует без индекса.
+    """
+    help = 'seed data, EXPLAIN hot API queries and fail on bad plans'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=300)
+        parser.add_argument('--recipes', type=int, default=5000)
+        parser.add_argument('--no-seed', action='store_true',
+                            help='explain against the existing data')
+        parser.add_argument('--keep', action='store_true',
+                            help='commit the seeded data')
+        parser.add_argument('--plans', action='store_true',
+                            help='print every plan')
+
+    @staticmethod
+    def get_context():
+        user = User.objects.annotate(
+            follows=Count('follower')).order_by('-follows').first()
+        author = User.objects.annotate(
+            count=Count('recipes')).order_by('-count').first()
+        recipe = Recipe.objects.annotate(
+            count=Count('favorites')).order_by('-count').first()
+        if user is None or recipe is None:
+            raise CommandError('Нет данных для проверки, уберите --no-seed')
+        dates = Recipe.objects.order_by('-pub_date').values_list(
+            'pub_date', flat=True)
+        tag = Tag.objects.values_list('slug', flat=True).first()
+        return {
+            'user': user,
+            'author': author,
+            'recipe': recipe,
+            'tag': tag,
+            'word': recipe.name.split()[0],
+            'pub_date': dates[dates.count() // 2],
+            'recipe_ids': list(Recipe.objects.values_list(
+                'id', flat=True)[:PAGE]),
+        }
+
+    def explain(self, options):
+        if not options['no_seed']:
+            counts = seed(users=options['users'], recipes=options['recipes'])
+            self.stdout.write(', '.join(
+                f'{name}: {count}' for name, count in counts.items()))
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        context = self.get_context()
+        failed = []
+        for hot_query in HOT_QUERIES:
+            plan = hot_query.build(context).explain()
+            problems = find_problems(plan, hot_query)
+            status = self.style.ERROR('FAIL') if problems else (
+                self.style.SUCCESS('OK'))
+            self.stdout.write(f'{status} {hot_query.name}')
+            for problem in problems:
+                self.stdout.write(f'    {problem}')
+            if problems or options['plans']:
+                self.stdout.write('    ' + plan.replace('\n', '\n    '))
+            if problems:
+                failed.append(hot_query.name)
+        return failed
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            failed = self.explain(options)
+            if not options['keep']:
+                transaction.set_rollback(True)
+        if failed:
+            raise CommandError(
+                f'Планы без индексов: {", ".join(failed)}')
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from recipes.models import Recipe
+
+from api.utils.images import generate_variants
+
+
+class Command(BaseCommand):
+    """
+    Создание уменьшенных копий картинок для уже загруженных рецептов.
+    """
+    help = 'generate thumbnail and medium variants for recipe images'
+
+    def handle(self, *args, **options):
+        names = Recipe.objects.filter(
+            Q(image_thumbnail__isnull=True) | Q(image_medium__isnull=True)
+            | Q(image_thumbnail='') | Q(image_medium='')
+        ).exclude(image='').exclude(image__isnull=True).values_list(
+            'image', flat=True).distinct()
+        count = 0
+        for name in names.order_by():
+            try:
+                generate_variants(name)
+            except OSError as error:
+                self.stderr.write(f'{name}: {error}')
+                continue
+            count += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {count}'))
@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.deprecation import MiddlewareMixin
+from recipes.versions import is_shared_cache
+
+from .db_router import use_replica
+from .utils.timing import RequestTiming, current_timing, record, server_timing
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def can_see_timing(user):
+    return user.is_authenticated and (
+        user.is_staff or user.access_administrator)
+
+
+class ServerTimingMiddleware(MiddlewareMixin):
+    """
+    Замеры SQL, работы вью и рендеринга для каждого запроса.
+    Агрегаты копятся по маршрутам в памяти процесса, заголовок
+    Server-Timing получают только сотрудники.
+    Должна стоять первой в MIDDLEWARE: тогда process_template_response
+    вызывается последним, непосредственно перед рендерингом.
+    Замер запроса живёт в контекстной переменной current_timing
+    на время get_response, поэтому работает и под WSGI, и под ASGI,
+    включая запросы к базе из потоков async-вью.
+    """
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        token = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        token = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timing.reset(token)
+        return await sync_to_async(
+            self.process_response, thread_sensitive=True)(request, response)
+
+    @staticmethod
+    def start(request):
+        request.timing = RequestTiming()
+        return current_timing.set(request.timing)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.timing.start_view()
+
+    def process_template_response(self, request, response):
+        request.timing.start_render()
+        response.add_post_render_callback(
+            lambda rendered: request.timing.finish_render())
+        return response
+
+    def process_response(self, request, response):
+        timing = request.timing
+        timing.finish()
+        metrics = timing.metrics()
+        match = request.resolver_match
+        if match is not None:
+            record(f'{request.method} {match.route}', metrics)
+        # DRF переносит пользователя из токена в исходный HttpRequest
+        user = getattr(request, 'user', None)
+        if user is not None and can_see_timing(user):
+            response['Server-Timing'] = server_timing(metrics)
+        return response
+
+
+def client_key(request):
+    """
+    Ключ клиента для закрепления за основной базой:
+    хеш токена или сессионной куки, None для анонима без сессии.
+    """
+    credentials = request.headers.get('Authorization') or (
+        request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    if not credentials:
+        return None
+    digest = hashlib.sha256(credentials.encode('utf-8')).hexdigest()
+    return f'replica-pin:{digest}'
+
+
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    """
+    Безопасные запросы читают с реплик. После успешного изменяющего
+    запроса клиент на REPLICA_PIN_SECONDS закрепляется за основной
+    базой, чтобы сразу видеть свои изменения (read-your-writes).
+    Метка - подписанная кука, которая не зависит от кеша и процесса.
+    Для клиентов без кук (токен из скриптов) метка дублируется
+    в кеше, если он общий для всех процессов.
+    """
+    cookie = 'replica_pin'
+    salt = 'api.middleware.ReplicaRoutingMiddleware'
+
+    def is_pinned(self, request):
+        if request.get_signed_cookie(
+                self.cookie, default=None, salt=self.salt,
+                max_age=settings.REPLICA_PIN_SECONDS) is not None:
+            return True
+        key = client_key(request)
+        return (key is not None and is_shared_cache()
+                and cache.get(key) is not None)
+
+    def process_request(self, request):
+        use_replica.set(
+            request.method in SAFE_METHODS and not self.is_pinned(request))
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_signed_cookie(
+                self.cookie, '1', salt=self.salt,
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True, samesite='Lax')
+            key = client_key(request)
+            if key is not None and is_shared_cache():
+                cache.set(key, True, settings.REPLICA_PIN_SECONDS)
+        use_replica.set(False)
+        return response
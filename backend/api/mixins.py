@@ -0,0 +1,64 @@
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from recipes.versions import get_version
+from rest_framework import status
+from rest_framework.response import Response
+
+from .pagination import KeysetPagination
+
+
+# Сериализованные списки по имени версии: (версия, данные)
+versioned_payloads = {}
+
+
+def versioned_etag(name, version):
+    return f'"{name}-{version}"'
+
+
+def is_not_modified(request, etag):
+    return etag in parse_etags(request.headers.get('If-None-Match', ''))
+
+
+class VersionedListMixin:
+    """
+    Кеширует сериализованный список в памяти процесса по версии данных
+    и отдаёт ETag, чтобы клиенты и nginx перепроверяли ответ через 304.
+    Без версии (нет общего кеша) список каждый раз читается из базы.
+    """
+    version_name = None
+
+    def list(self, request, *args, **kwargs):
+        version = get_version(self.version_name)
+        if version is None:
+            return super().list(request, *args, **kwargs)
+        etag = versioned_etag(self.version_name, version)
+        if is_not_modified(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            cached = versioned_payloads.get(self.version_name)
+            if cached is None or cached[0] != version:
+                data = super().list(request, *args, **kwargs).data
+                cached = versioned_payloads[self.version_name] = (
+                    version, data)
+            response = Response(cached[1])
+        response['ETag'] = etag
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+
+class CursorPaginationMixin:
+    """
+    Переключает вью на постраничный вывод по курсору,
+    если в запросе есть параметр cursor (пустой - первая страница).
+    """
+    cursor_pagination_class = KeysetPagination
+    cursor_ordering = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            param = self.cursor_pagination_class.cursor_query_param
+            if param not in self.request.query_params:
+                return super().paginator
+            self._paginator = self.cursor_pagination_class()
+        return self._paginator
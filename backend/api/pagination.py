@@ -1,5 +1,93 @@
-from rest_framework.pagination import PageNumberPagination
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class PopularPagination(LimitPageNumberPagination):
+    """
+    У рейтинга всегда есть размер страницы, чтобы запасной вариант
+    без предрасчёта не отдавал все рецепты разом.
+    """
+    page_size = 6
+    max_page_size = 100
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Постраничный вывод по ключу сортировки с непрозрачным курсором.
+    Стоимость страницы не зависит от её номера: вместо OFFSET
+    и COUNT(*) выборка продолжается с позиции последней записи.
+    Порядок задаётся атрибутом cursor_ordering у вью.
+    """
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        return getattr(view, 'cursor_ordering', None) or self.ordering
+
+
+class TimelinePagination(CursorPagination):
+    """
+    Курсор ленты подписок: позиция (pub_date, id) последнего рецепта
+    страницы. Лента листается только вперёд, ссылки previous нет.
+    """
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    def decode_position(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            pub_date, recipe_id = urlsafe_b64decode(
+                encoded.encode('ascii')).decode('ascii').split('|')
+            position = (parse_datetime(pub_date), int(recipe_id))
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if position[0] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    @staticmethod
+    def encode_position(position):
+        pub_date, recipe_id = position
+        return urlsafe_b64encode(
+            f'{pub_date.isoformat()}|{recipe_id}'.encode('ascii')
+        ).decode('ascii')
+
+    def paginate_rows(self, rows, request):
+        """
+        Страница из строк (pub_date, id), прочитанных с запасом
+        в одну строку: лишняя строка означает, что есть продолжение.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        self.next_position = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_position = rows[-1]
+        return rows
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param,
+            self.encode_position(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
@@ -19,3 +19,10 @@ class AuthorOrModeratorOrAdmin(permissions.BasePermission):
                     and request.user.access_administrator)
                 or (request.user.is_authenticated
                     and request.user.access_moderator))
+
+
+class IsAdministrator(permissions.BasePermission):
+
+    def has_permission(self, request, view):
+        return (request.user.is_authenticated
+                and request.user.access_administrator)
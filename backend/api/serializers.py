@@ -1,10 +1,16 @@
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from drf_extra_fields.fields import Base64ImageField
-from recipes.models import (Cart, Favorite, Ingredient, Recipe,
-                            RecipeIngredient, Tag)
+from recipes import timeline
+from recipes.counters import change_counter
+from recipes.models import (Cart, CartIngredient, Favorite, Ingredient,
+                            Recipe, RecipeIngredient, Tag)
 from rest_framework import serializers
 from users.models import Follow, User
 
+from .utils.images import (HashedBase64ImageField, ImageVariantField,
+                           process_recipe_image)
+from .utils.shopping_list import CONTENT_TYPES
+
 
 class TagSerializer(serializers.ModelSerializer):
     """
@@ -44,7 +50,7 @@ class AddIngredientSerializer(serializers.ModelSerializer):
     """
     Сериализатор добавления ингредиентов.
     """
-    id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    id = serializers.IntegerField()
     amount = serializers.IntegerField()
 
     class Meta:
@@ -104,6 +110,8 @@ class CustomUserSerializer(UserSerializer):
         user = self.context.get('request').user
         if user.is_anonymous:
             return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return Follow.objects.filter(user=user, author=obj.id).exists()
 
 
@@ -111,7 +119,7 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
     """
     Короткий сериализатор рецептов.
     """
-    image = Base64ImageField()
+    image = ImageVariantField('image_thumbnail')
 
     class Meta:
         model = Recipe
@@ -136,44 +144,44 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     tags = TagSerializer(many=True)
     author = CustomUserSerializer()
     ingredients = serializers.SerializerMethodField()
+    image = ImageVariantField('image_medium')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        exclude = ['pub_date']
+        exclude = ['pub_date', 'image_thumbnail', 'image_medium',
+                   'favorites_count', 'in_carts_count']
 
     def get_ingredients(self, obj):
-        queryset = RecipeIngredient.objects.filter(recipe=obj)
+        queryset = obj.RecipeIngredient.all()
         return RecipeIngredientSerializer(queryset, many=True).data
 
     def get_is_favorited(self, obj):
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         user = self.context['request'].user
         return (user.is_authenticated and Favorite.objects.filter(
             recipe=obj, user=user
         ).exists())
 
     def get_is_in_shopping_cart(self, obj):
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         user = self.context['request'].user
         return (user.is_authenticated and Cart.objects.filter(
             recipe=obj, user=user
         ).exists())
 
 
-class FollowSerializer(serializers.ModelSerializer):
+class FollowSerializer(CustomUserSerializer):
 
     """
     Сериализатор подписок.
     """
 
-    id = serializers.ReadOnlyField(source='author.id')
-    email = serializers.ReadOnlyField(source='author.email')
-    username = serializers.ReadOnlyField(source='author.username')
-    first_name = serializers.ReadOnlyField(source='author.first_name')
-    last_name = serializers.ReadOnlyField(source='author.last_name')
-    is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         model = User
@@ -188,22 +196,22 @@ class FollowSerializer(serializers.ModelSerializer):
             'recipes_count'
         )
 
-    def get_is_subscribed(self, obj):
-        return Follow.objects.filter(
-            user=obj.user, author=obj.author
-        ).exists()
+    @staticmethod
+    def get_recipes_limit(request):
+        limit = request.GET.get('recipes_limit')
+        if limit and limit.isdigit():
+            return int(limit)
+        return None
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        limit = request.GET.get('recipes_limit')
-        queryset = Recipe.objects.filter(author=obj.author)
-        if limit:
-            queryset = queryset[:int(limit)]
+        if hasattr(obj, 'short_recipes'):
+            return ShortRecipeSerializer(obj.short_recipes, many=True).data
+        limit = self.get_recipes_limit(self.context.get('request'))
+        queryset = Recipe.objects.filter(author=obj)
+        if limit is not None:
+            queryset = queryset[:limit]
         return ShortRecipeSerializer(queryset, many=True).data
 
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.author).count()
-
 
 class RecipeWriteSerializer(serializers.ModelSerializer):
     """
@@ -213,7 +221,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
         queryset=Tag.objects.all(), many=True)
     ingredients = AddIngredientSerializer(many=True)
     author = CustomUserSerializer(read_only=True)
-    image = Base64ImageField()
+    image = HashedBase64ImageField(upload_to='images/')
 
     class Meta:
         model = Recipe
@@ -228,8 +236,7 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
             'cooking_time'
         )
 
-    def validate_ingredients(self, data):
-        ingredients = data['ingredients']
+    def validate_ingredients(self, ingredients):
         ingredients_list = []
         for ingredient in ingredients:
             ingredient_id = ingredient['id']
@@ -243,10 +250,16 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError({
                     'amount': 'Нужно добавить хотя-бы один ингредиент'
                 })
-        return data
+        found = Ingredient.objects.filter(
+            id__in=ingredients_list).values_list('id', flat=True)
+        missing = set(ingredients_list).difference(found)
+        if missing:
+            raise serializers.ValidationError({
+                'ingredients': f'Ингредиенты не найдены: {sorted(missing)}'
+            })
+        return ingredients
 
-    def validate_tags(self, data):
-        tags = data['tags']
+    def validate_tags(self, tags):
         if not tags:
             raise serializers.ValidationError({
                 'tags': 'Нужно выбрать тэг'
@@ -258,49 +271,101 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                     'tags': 'Тэги должны быть уникальны'
                 })
             tags_list.append(tag)
-        return data
+        return tags
 
-    def validate_cooking_time(self, data):
-        cooking_time = data['cooking_time']
+    def validate_cooking_time(self, cooking_time):
         if int(cooking_time) <= 0:
             raise serializers.ValidationError({
                 'cooking_time': 'Время приготовления должно быть больше 0'
             })
-        return data
+        return cooking_time
 
     @staticmethod
     def create_ingredients(ingredients, recipe):
-        for ingredient in ingredients:
-            RecipeIngredient.objects.create(
-                recipe=recipe, ingredient=ingredient['id'],
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient['id'],
                 amount=ingredient['amount']
             )
+            for ingredient in ingredients
+        )
 
     @staticmethod
-    def create_tags(tags, recipe):
-        for tag in tags:
-            recipe.tags.add(tag)
-
+    def update_ingredients(ingredients, recipe):
+        """
+        Сравнивает новые ингредиенты с сохранёнными и выполняет
+        не больше одной вставки, одного обновления и одного удаления.
+        Возвращает изменения количеств {ingredient_id: delta}.
+        """
+        stored = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in RecipeIngredient.objects.filter(
+                recipe=recipe)
+        }
+        amounts = {
+            ingredient['id']: ingredient['amount']
+            for ingredient in ingredients
+        }
+        delta = {}
+        to_update = []
+        to_delete = []
+        for ingredient_id, recipe_ingredient in stored.items():
+            amount = amounts.get(ingredient_id, 0)
+            delta[ingredient_id] = amount - recipe_ingredient.amount
+            if not amount:
+                to_delete.append(recipe_ingredient.id)
+            elif amount != recipe_ingredient.amount:
+                recipe_ingredient.amount = amount
+                to_update.append(recipe_ingredient)
+        to_create = [
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in stored
+        ]
+        for recipe_ingredient in to_create:
+            delta[recipe_ingredient.ingredient_id] = recipe_ingredient.amount
+        if to_delete:
+            RecipeIngredient.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ['amount'])
+        if to_create:
+            RecipeIngredient.objects.bulk_create(to_create)
+        return delta
+
+    @transaction.atomic
     def create(self, validated_data):
         author = self.context.get('request').user
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(author=author, **validated_data)
-        self.create_tags(tags, recipe)
+        change_counter(User, author.id, 'recipes_count')
+        timeline.fan_out(recipe, author.followers_count)
+        recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
+        process_recipe_image(recipe)
         return recipe
 
     def to_representation(self, instance):
         request = self.context.get('request')
         context = {'request': request}
+        instance = Recipe.objects.with_user_data(request.user).get(
+            pk=instance.pk)
         return RecipeReadSerializer(instance, context=context).data
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        instance.tags.clear()
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        self.create_tags(validated_data.pop('tags'), instance)
-        self.create_ingredients(validated_data.pop('ingredients'), instance)
-        return super().update(instance, validated_data)
+        instance.tags.set(validated_data.pop('tags'))
+        delta = self.update_ingredients(
+            validated_data.pop('ingredients'), instance)
+        CartIngredient.objects.apply_amounts(
+            Cart.objects.filter(recipe=instance).values_list(
+                'user_id', flat=True),
+            delta
+        )
+        instance = super().update(instance, validated_data)
+        process_recipe_image(instance)
+        return instance
 
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
@@ -319,3 +384,34 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         context = {'request': request}
         return ShortRecipeSerializer(
             instance.recipe, context=context).data
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """
+    Список id рецептов для массового добавления и удаления.
+    """
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+
+
+class ShoppingListJobSerializer(serializers.Serializer):
+    """
+    Параметры задачи выгрузки списка покупок.
+    """
+    format = serializers.ChoiceField(choices=CONTENT_TYPES, default='pdf')
+
+
+class CookSerializer(serializers.Serializer):
+    """
+    Параметры подбора рецептов по имеющимся ингредиентам.
+    """
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
+    max_missing = serializers.IntegerField(
+        min_value=0, required=False, allow_null=True)
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_token, forget_user
+from .utils import timing
+
+
+# Кеш сбрасывается сразу и ещё раз после коммита: параллельный запрос
+# мог прочитать старую запись до конца транзакции и закешировать её
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    key = instance.key
+    forget_token(key)
+    transaction.on_commit(lambda: forget_token(key))
+
+
+@receiver(post_save, sender=get_user_model())
+def forget_saved_user(sender, instance, **kwargs):
+    user_id = instance.pk
+    forget_user(user_id)
+    transaction.on_commit(lambda: forget_user(user_id))
+
+
+@receiver(connection_created)
+def track_connection_queries(sender, connection, **kwargs):
+    timing.install(connection)
@@ -0,0 +1,80 @@
+from api.authentication import (USER_KEY, CachedTokenAuthentication,
+                                token_cache_key)
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from recipes.counters import change_counter
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+from users.models import User
+
+from .utils import FoodgramTestCase, shared_cache
+
+
+class CachedTokenAuthenticationTest(FoodgramTestCase):
+    """
+    Кеш пользователя по токену.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.users[1]
+        self.token_client = APIClient()
+        self.token_client.credentials(HTTP_AUTHORIZATION='Token ' + (
+            Token.objects.create(user=self.author).key))
+
+    def token_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.token_client.get('/api/users/me/')
+        self.assertEqual(response.status_code, 200)
+        return sum('authtoken_token' in query['sql']
+                   for query in context.captured_queries)
+
+    def test_local_cache_is_not_used(self):
+        self.assertEqual(self.token_queries(), 1)
+        self.assertEqual(self.token_queries(), 1)
+
+    @shared_cache
+    def test_shared_cache(self):
+        self.assertEqual(self.token_queries(), 1)
+        self.assertEqual(self.token_queries(), 0)
+        cache.clear()
+        self.assertEqual(self.token_queries(), 1)
+
+    @shared_cache
+    def test_counters_are_not_cached(self):
+        key = Token.objects.get(user=self.author).key
+        authentication = CachedTokenAuthentication()
+        recipes_count = authentication.authenticate_credentials(
+            key)[0].recipes_count
+        change_counter(User, self.author.pk, 'recipes_count', 7)
+        user, _ = authentication.authenticate_credentials(key)
+        self.assertEqual(user.recipes_count, recipes_count + 7)
+
+    @shared_cache
+    def test_full_save_keeps_counters(self):
+        self.token_queries()
+        change_counter(User, self.author.pk, 'followers_count', 5)
+        response = self.token_client.post('/api/users/set_password/', {
+            'current_password': 'password', 'new_password': 'Pa55-word-2'})
+        self.assertEqual(response.status_code, 204, response.data)
+        author = User.objects.get(pk=self.author.pk)
+        self.assertTrue(author.check_password('Pa55-word-2'))
+        self.assertEqual(author.followers_count, 1 + 5)
+
+    @shared_cache
+    def test_deactivated_in_transaction(self):
+        key = Token.objects.get(user=self.author).key
+        authentication = CachedTokenAuthentication()
+        authentication.authenticate_credentials(key)
+        cached = cache.get_many(
+            [token_cache_key(key), USER_KEY.format(self.author.pk)])
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.author.is_active = False
+                self.author.save()
+                # Параллельный запрос прочитал строку до коммита
+                cache.set_many(cached)
+        with self.assertRaises(AuthenticationFailed):
+            authentication.authenticate_credentials(key)
@@ -0,0 +1,129 @@
+from unittest import mock
+
+from django.test import Client
+from recipes.counters import change_counter, reconcile
+from recipes.models import (Cart, CartIngredient, CartIngredientQuerySet,
+                            Favorite, Recipe, RecipeIngredient)
+from users.models import Follow, User
+
+from .utils import FoodgramTestCase
+
+
+class CountersTest(FoodgramTestCase):
+    """
+    Денормализованные счётчики и суммы корзин остаются верными
+    после полного сохранения объектов и правок из админки.
+    """
+
+    def setUp(self):
+        super().setUp()
+        for recipe in self.recipes[:4]:
+            self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+            self.client.post(f'/api/recipes/{recipe.id}/favorite/')
+        self.admin = Client()
+        self.admin.force_login(User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='admin'))
+
+    def assert_consistent(self):
+        self.assertFalse(any(reconcile(check=True).values()))
+        self.assertEqual(
+            CartIngredient.objects.live_totals(),
+            dict(((user_id, ingredient_id), amount)
+                 for user_id, ingredient_id, amount
+                 in CartIngredient.objects.values_list(
+                     'user_id', 'ingredient_id', 'amount')))
+
+    def test_full_save_keeps_counters(self):
+        author = User.objects.get(pk=self.users[1].pk)
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        change_counter(User, author.pk, 'followers_count', 5)
+        change_counter(Recipe, recipe.pk, 'favorites_count', 5)
+        author.first_name = 'Новое имя'
+        author.set_password('new-password')
+        author.save()
+        recipe.name = 'Новое название'
+        recipe.save()
+        author.refresh_from_db()
+        recipe.refresh_from_db()
+        self.assertEqual(author.first_name, 'Новое имя')
+        self.assertEqual(author.followers_count, 1 + 5)
+        self.assertEqual(recipe.name, 'Новое название')
+        self.assertEqual(recipe.favorites_count, 1 + 5)
+
+    def test_apply_amounts(self):
+        user_id = self.users[3].pk
+        first, second, third = (
+            ingredient.pk for ingredient in self.ingredients[:3])
+        with mock.patch.object(CartIngredientQuerySet,
+                               'upsert_batch_size', 2):
+            CartIngredient.objects.apply_amounts(
+                [user_id], {first: 3, second: 2, third: 1})
+            # Точка сохранения, прибавление, удаление обнулившихся
+            # и освобождение точки - без чтения строк
+            with self.assertNumQueries(4):
+                CartIngredient.objects.apply_amounts(
+                    [user_id], {first: 4, second: -2})
+        self.assertEqual(
+            dict(CartIngredient.objects.filter(user_id=user_id).values_list(
+                'ingredient_id', 'amount')),
+            {first: 7, third: 1})
+
+    def delete(self, obj):
+        meta = obj._meta
+        response = self.admin.post(
+            f'/admin/{meta.app_label}/{meta.model_name}/{obj.pk}/delete/',
+            {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(type(obj).objects.filter(pk=obj.pk).exists())
+        self.assert_consistent()
+
+    def test_admin_delete(self):
+        self.assert_consistent()
+        self.delete(Cart.objects.filter(user=self.user).first())
+        self.delete(Favorite.objects.filter(user=self.user).first())
+        self.delete(Follow.objects.filter(user=self.user).first())
+        self.delete(RecipeIngredient.objects.filter(
+            recipe__cart__user=self.user).first())
+        self.delete(Recipe.objects.filter(cart__user=self.user).first())
+        self.delete(self.users[3])
+
+    def test_admin_bulk_delete(self):
+        response = self.admin.post('/admin/recipes/recipe/', {
+            'action': 'delete_selected', 'post': 'yes',
+            '_selected_action': [recipe.pk for recipe in self.recipes[:3]],
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Recipe.objects.count(), self.recipes_count - 3)
+        self.assert_consistent()
+
+    def test_admin_change(self):
+        follow = Follow.objects.filter(user=self.user).first()
+        response = self.admin.post(
+            f'/admin/users/follow/{follow.pk}/change/',
+            {'user': self.user.pk, 'author': self.users[3].pk})
+        self.assertEqual(response.status_code, 302)
+        cart = Cart.objects.filter(user=self.user).first()
+        response = self.admin.post(
+            f'/admin/recipes/cart/{cart.pk}/change/',
+            {'user': self.users[2].pk, 'recipe': cart.recipe_id})
+        self.assertEqual(response.status_code, 302)
+        recipe_ingredient = RecipeIngredient.objects.filter(
+            recipe__cart__user=self.user).first()
+        response = self.admin.post(
+            f'/admin/recipes/recipeingredient/{recipe_ingredient.pk}'
+            '/change/', {
+                'recipe': recipe_ingredient.recipe_id,
+                'ingredient': self.ingredients[9].pk,
+                'amount': 100,
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assert_consistent()
+
+    def test_admin_add(self):
+        response = self.admin.post('/admin/users/follow/add/', {
+            'user': self.users[3].pk, 'author': self.users[1].pk})
+        self.assertEqual(response.status_code, 302)
+        response = self.admin.post('/admin/recipes/favorite/add/', {
+            'user': self.users[3].pk, 'recipe': self.recipes[0].pk})
+        self.assertEqual(response.status_code, 302)
+        self.assert_consistent()
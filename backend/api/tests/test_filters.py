@@ -0,0 +1,27 @@
+from api.filters import RecipeFilter
+from recipes.models import Recipe
+
+from .utils import FoodgramTestCase
+
+
+class TagFilterTest(FoodgramTestCase):
+    """
+    Фильтр по тегам.
+    """
+
+    def test_tags(self):
+        response = self.client.get(
+            '/api/recipes/', {'tags': ['tag1', 'tag2'], 'limit': 20})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], Recipe.objects.filter(
+            tags__slug__in=['tag1', 'tag2']).distinct().count())
+
+    def test_unknown_tag(self):
+        # Слаг прошёл проверку выбора, но тега уже нет
+        queryset = RecipeFilter().get_tags(
+            Recipe.objects.all(), 'tags', ['tag0', 'deleted'])
+        self.assertQuerysetEqual(
+            queryset.order_by('id'),
+            Recipe.objects.filter(tags__slug='tag0').order_by('id'))
+        self.assertFalse(RecipeFilter().get_tags(
+            Recipe.objects.all(), 'tags', ['deleted']).exists())
@@ -0,0 +1,45 @@
+import base64
+import shutil
+import tempfile
+
+from api.utils.images import generate_variants
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import override_settings
+
+from .utils import PNG, FoodgramTestCase, shared_cache
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@shared_cache
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ImageVariantsTest(FoodgramTestCase):
+    """
+    Готовые копии картинки сбрасывают закешированную ленту.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        super().setUp()
+        self.name = self.recipes[0].image.name
+        if not default_storage.exists(self.name):
+            default_storage.save(self.name, ContentFile(
+                base64.b64decode(PNG.split(',', 1)[1])))
+
+    def feed_images(self):
+        response = self.anonymous.get('/api/recipes/', {'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        return [recipe['image'] for recipe in response.data['results']]
+
+    def test_feed_invalidated(self):
+        self.assertTrue(all(
+            image.endswith('.png') for image in self.feed_images()))
+        with self.captureOnCommitCallbacks(execute=True):
+            generate_variants(self.name)
+        self.assertTrue(all(
+            image.endswith('.webp') for image in self.feed_images()))
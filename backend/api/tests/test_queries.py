@@ -0,0 +1,66 @@
+from .utils import FoodgramTestCase, shared_cache
+
+
+@shared_cache
+class RecipeQueriesTest(FoodgramTestCase):
+    """
+    Число запросов списка и карточки рецепта не зависит
+    от размера страницы.
+    """
+    # рецепты, COUNT страницы, теги, авторы, ингредиенты
+    LIST_QUERIES = 5
+    # рецепт, теги, автор, ингредиенты
+    DETAIL_QUERIES = 4
+
+    def test_list(self):
+        for limit in (1, 6, self.recipes_count):
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(self.LIST_QUERIES):
+                    response = self.client.get(
+                        '/api/recipes/', {'limit': limit})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_list_filtered(self):
+        params = {
+            'limit': 6, 'tags': ['tag0', 'tag1'],
+            'is_favorited': 0, 'author': self.users[1].id,
+        }
+        # первый запрос загружает словарь тегов процесса
+        self.client.get('/api/recipes/', params)
+        # плюс проверка автора в ModelChoiceFilter
+        with self.assertNumQueries(self.LIST_QUERIES + 1):
+            response = self.client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['results'])
+
+    def test_list_anonymous(self):
+        with self.assertNumQueries(self.LIST_QUERIES):
+            response = self.anonymous.get('/api/recipes/', {'limit': 6})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(
+            recipe['is_favorited'] for recipe in response.data['results']))
+
+    def test_detail(self):
+        with self.assertNumQueries(self.DETAIL_QUERIES):
+            response = self.client.get(f'/api/recipes/{self.recipes[0].id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['ingredients']), 3)
+        self.assertTrue(response.data['author']['is_subscribed'])
+
+
+class SubscriptionQueriesTest(FoodgramTestCase):
+    # подписки, COUNT страницы, рецепты авторов
+    QUERIES = 3
+
+    def test_subscriptions(self):
+        for limit in (1, 2):
+            with self.subTest(limit=limit):
+                with self.assertNumQueries(self.QUERIES):
+                    response = self.client.get(
+                        '/api/users/subscriptions/',
+                        {'limit': limit, 'recipes_limit': 2})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+                for author in response.data['results']:
+                    self.assertLessEqual(len(author['recipes']), 2)
@@ -0,0 +1,56 @@
+from unittest import mock
+
+from api.utils import recipe_index
+from recipes.models import RecipeIngredient
+from recipes.versions import bump_version
+
+from .utils import FoodgramTestCase, shared_cache
+
+
+@shared_cache
+class RecipeIndexTest(FoodgramTestCase):
+    """
+    Обратный индекс ингредиентов перестраивается в фоне,
+    запросы тем временем получают старый индекс.
+    """
+
+    def setUp(self):
+        super().setUp()
+        recipe_index._index = None
+        recipe_index._building = False
+        self.addCleanup(setattr, recipe_index, '_index', None)
+        self.ingredient = self.ingredients[9]
+
+    def add_ingredient(self):
+        RecipeIngredient.objects.create(
+            recipe=self.recipes[0], ingredient=self.ingredient, amount=1)
+        bump_version(recipe_index.VERSION)
+
+    def matched(self):
+        return [row[0] for row in recipe_index.match([self.ingredient.id])]
+
+    def test_background_rebuild(self):
+        self.assertEqual(self.matched(), [])
+        self.add_ingredient()
+        with mock.patch.object(recipe_index.workers, 'submit') as submit:
+            self.assertEqual(self.matched(), [])
+            self.assertEqual(self.matched(), [])
+        # Одна перестройка на смену версии, пока она не закончилась
+        submit.assert_called_once_with(recipe_index.rebuild, mock.ANY)
+        submit.call_args[0][0](*submit.call_args[0][1:])
+        self.assertEqual(self.matched(), [self.recipes[0].id])
+        self.assertFalse(recipe_index._building)
+
+    def test_first_build(self):
+        self.add_ingredient()
+        with mock.patch.object(recipe_index.workers, 'submit') as submit:
+            self.assertEqual(self.matched(), [self.recipes[0].id])
+        submit.assert_not_called()
+
+    def test_query_matches(self):
+        ingredient_ids = [ingredient.id for ingredient in self.ingredients[:4]]
+        for max_missing in (None, 0, 1):
+            with self.subTest(max_missing=max_missing):
+                self.assertEqual(
+                    recipe_index.query_matches(ingredient_ids, max_missing),
+                    recipe_index.match(ingredient_ids, max_missing))
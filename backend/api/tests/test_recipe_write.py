@@ -0,0 +1,107 @@
+import shutil
+import tempfile
+
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Ingredient, RecipeIngredient
+
+from .utils import PNG, FoodgramTestCase, create_recipe
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class RecipeWriteQueriesTest(FoodgramTestCase):
+    """
+    Создание и изменение рецепта выполняется за число запросов,
+    не зависящее от количества ингредиентов.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.ingredients += [
+            Ingredient.objects.create(name=f'Ещё ингредиент {number}',
+                                      measurement_unit='шт')
+            for number in range(40)
+        ]
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def payload(self, ingredients, tags, amount=5):
+        return {
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 15,
+            'image': PNG,
+            'tags': [tag.id for tag in tags],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': amount}
+                for ingredient in ingredients
+            ],
+        }
+
+    def count_queries(self, method, url, data):
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data, format='json')
+        self.assertIn(response.status_code, (200, 201), response.data)
+        return len(context.captured_queries), response
+
+    def test_create(self):
+        counts = {}
+        for size in (1, 5, 30):
+            counts[size], response = self.count_queries(
+                'post', '/api/recipes/',
+                self.payload(self.ingredients[:size], self.tags))
+            self.assertEqual(len(response.data['ingredients']), size)
+        self.assertEqual(len(set(counts.values())), 1, counts)
+
+    def update_queries(self, changes):
+        """
+        Число запросов на изменение рецепта из 30 ингредиентов
+        при каждом из наборов изменений {номер ингредиента: количество}.
+        """
+        counts = []
+        for number, change in enumerate(changes):
+            recipe = create_recipe(
+                self.user, self.tags, self.ingredients[:30],
+                f'Рецепт {number}')
+            amounts = dict(RecipeIngredient.objects.filter(
+                recipe=recipe).values_list('ingredient_id', 'amount'))
+            for index, amount in change.items():
+                ingredient_id = self.ingredients[index].id
+                if amount:
+                    amounts[ingredient_id] = amount
+                else:
+                    del amounts[ingredient_id]
+            payload = self.payload([], self.tags)
+            payload['ingredients'] = [
+                {'id': ingredient_id, 'amount': amount}
+                for ingredient_id, amount in amounts.items()
+            ]
+            count, _ = self.count_queries(
+                'patch', f'/api/recipes/{recipe.id}/', payload)
+            counts.append(count)
+            self.assertEqual(dict(RecipeIngredient.objects.filter(
+                recipe=recipe).values_list('ingredient_id', 'amount')),
+                amounts)
+        return counts
+
+    def test_update_amounts(self):
+        counts = self.update_queries([
+            {0: 100},
+            {index: 100 for index in range(30)},
+        ])
+        self.assertEqual(counts[0], counts[1])
+
+    def test_update_replace(self):
+        counts = self.update_queries([
+            {0: 0, 30: 1},
+            {**{index: 0 for index in range(20)},
+             **{index: 1 for index in range(30, 50)}},
+        ])
+        self.assertEqual(counts[0], counts[1])
@@ -0,0 +1,103 @@
+from unittest import skipUnless
+
+from api.db_router import use_replica
+from api.middleware import ReplicaRoutingMiddleware
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Ingredient, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .utils import create_recipe, create_user
+
+
+class ReplicaPinTest(SimpleTestCase):
+    """
+    Закрепление клиента за основной базой после изменений.
+    """
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.status = 200
+        self.middleware = ReplicaRoutingMiddleware(self.get_response)
+
+    def get_response(self, request):
+        self.replica = use_replica.get()
+        return HttpResponse(status=self.status)
+
+    def request(self, method, cookies=None, **headers):
+        request = getattr(self.factory, method)('/api/recipes/', **headers)
+        request.COOKIES.update(cookies or {})
+        response = self.middleware(request)
+        return self.replica, {
+            name: morsel.value for name, morsel in response.cookies.items()}
+
+    def test_pin_cookie(self):
+        self.assertEqual(self.request('get'), (True, {}))
+        replica, cookies = self.request('post')
+        self.assertFalse(replica)
+        self.assertIn(ReplicaRoutingMiddleware.cookie, cookies)
+        self.assertFalse(self.request('get', cookies)[0])
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            self.assertTrue(self.request('get', cookies)[0])
+        forged = {ReplicaRoutingMiddleware.cookie: '1'}
+        self.assertTrue(self.request('get', forged)[0])
+
+    def test_failed_write_does_not_pin(self):
+        self.status = 400
+        self.assertEqual(self.request('post'), (False, {}))
+
+    def test_pin_in_shared_cache(self):
+        auth = {'HTTP_AUTHORIZATION': 'Token write'}
+        with override_settings(LOCAL_CACHE_BACKENDS=()):
+            self.request('post', **auth)
+            self.assertFalse(self.request('get', **auth)[0])
+            self.assertTrue(self.request(
+                'get', HTTP_AUTHORIZATION='Token other')[0])
+        # Метка в локальном кеше процесса не учитывается
+        self.request('post', HTTP_AUTHORIZATION='Token local')
+        self.assertTrue(self.request(
+            'get', HTTP_AUTHORIZATION='Token local')[0])
+
+
+@skipUnless(settings.DATABASE_REPLICAS,
+            'DB_REPLICAS=/tmp/replica.sqlite3 manage.py test api')
+class ReplicaRoutingTest(TransactionTestCase):
+    """
+    Маршрутизация на реплику через API. Локально запускается
+    с двумя базами SQLite: DB_REPLICAS=<путь к файлу>.
+    В тестах реплика - зеркало основной базы.
+    """
+    databases = '__all__'
+
+    def setUp(self):
+        self.user = create_user(0)
+        self.recipe = create_recipe(
+            create_user(1),
+            [Tag.objects.create(name='Тег', color='#000000', slug='tag')],
+            [Ingredient.objects.create(name='Соль', measurement_unit='г')])
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + (
+            Token.objects.create(user=self.user).key))
+
+    def queries(self, method, url):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(
+                    connections[settings.DATABASE_REPLICAS[0]]) as replica:
+            response = getattr(self.client, method)(url)
+        self.assertLess(response.status_code, 400)
+        return len(primary), len(replica)
+
+    def test_read_your_writes(self):
+        # Токен читается с основной базы, остальное - с реплики
+        primary, replica = self.queries('get', '/api/recipes/')
+        self.assertGreater(replica, 0)
+        self.queries('post', f'/api/recipes/{self.recipe.id}/favorite/')
+        primary, replica = self.queries('get', '/api/recipes/')
+        self.assertEqual(replica, 0)
+        self.assertTrue(self.client.get(
+            f'/api/recipes/{self.recipe.id}/').data['is_favorited'])
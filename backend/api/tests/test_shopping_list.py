@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.test import override_settings
+from recipes.models import ShoppingListJob
+
+from .utils import FoodgramTestCase, create_user
+
+URL = '/api/recipes/download_shopping_cart/'
+JOBS_URL = URL + 'jobs/'
+PRIVATE_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+class DownloadShoppingCartTest(FoodgramTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for recipe in self.recipes[:2]:
+            self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+
+    def test_formats(self):
+        for file_format, content_type in (
+                ('txt', 'text/plain; charset=utf-8'),
+                ('csv', 'text/csv; charset=utf-8'),
+                ('pdf', 'application/pdf')):
+            with self.subTest(format=file_format):
+                response = self.client.get(URL, {'format': file_format})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response['Content-Type'], content_type)
+
+    def test_txt_lines(self):
+        response = self.client.get(URL, {'format': 'txt'})
+        text = b''.join(response.streaming_content).decode('utf-8')
+        # у двух первых рецептов общие ингредиенты складываются
+        self.assertIn('Ингредиент 2 - 5 г', text)
+
+    def test_json_accept_falls_back_to_pdf(self):
+        response = self.client.get(URL, HTTP_ACCEPT='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+
+    def test_errors_are_json(self):
+        for params, headers in (
+                ({'format': 'pdf'}, {}),
+                ({}, {'HTTP_ACCEPT': 'application/pdf'}),
+                ({'format': 'txt'}, {})):
+            with self.subTest(params=params, headers=headers):
+                response = self.anonymous.get(URL, params, **headers)
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(
+                    response['Content-Type'], 'application/json')
+                self.assertIn('detail', response.json())
+
+
+@override_settings(PRIVATE_MEDIA_ROOT=PRIVATE_MEDIA_ROOT)
+@mock.patch('api.utils.workers.submit',
+            lambda function, *args: function(*args))
+class ShoppingListJobTest(FoodgramTestCase):
+    """
+    Фоновая выгрузка: состояние в базе, файл в закрытом хранилище.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(PRIVATE_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        super().setUp()
+        shutil.rmtree(PRIVATE_MEDIA_ROOT, ignore_errors=True)
+        self.client.post(f'/api/recipes/{self.recipes[0].id}/shopping_cart/')
+
+    def start(self, file_format='txt'):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(JOBS_URL, {'format': file_format})
+        self.assertEqual(response.status_code, 202)
+        return response.data
+
+    def test_job(self):
+        data = self.start()
+        self.assertEqual(data['status'], ShoppingListJob.PENDING)
+        job = ShoppingListJob.objects.get()
+        self.assertEqual(job.status, ShoppingListJob.READY)
+        path = os.path.join(PRIVATE_MEDIA_ROOT, job.file)
+        self.assertTrue(os.path.exists(path))
+        self.assertNotEqual(os.path.commonpath(
+            [path, settings.MEDIA_ROOT]), settings.MEDIA_ROOT)
+        data = self.client.get(f'{JOBS_URL}{data["id"]}/').data
+        self.assertEqual(data['status'], ShoppingListJob.READY)
+        response = self.client.get(data['file'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Ингредиент 0 - 1 г'.encode('utf-8'),
+                      b''.join(response.streaming_content))
+        # Тот же список покупок уже лежит в хранилище
+        self.assertEqual(self.start()['status'], ShoppingListJob.READY)
+
+    def test_other_user(self):
+        job_id = self.start()['id']
+        self.client.force_authenticate(create_user(10))
+        self.assertEqual(
+            self.client.get(f'{JOBS_URL}{job_id}/').status_code, 404)
+        self.assertEqual(
+            self.client.get(f'{JOBS_URL}{job_id}/file/').status_code, 404)
+
+    def test_pending(self):
+        with mock.patch('api.utils.workers.submit'):
+            job_id = self.start()['id']
+        response = self.client.get(f'{JOBS_URL}{job_id}/file/')
+        self.assertEqual(response.status_code, 409)
+
+    @override_settings(SHOPPING_LIST_JOB_TIMEOUT=0)
+    def test_expired(self):
+        job_id = self.start()['id']
+        self.assertEqual(
+            self.client.get(f'{JOBS_URL}{job_id}/').status_code, 404)
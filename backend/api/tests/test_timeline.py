@@ -0,0 +1,60 @@
+from unittest import mock
+
+from django.test import override_settings
+from recipes import timeline
+from rest_framework.test import APIClient
+from users.models import User
+
+from .utils import FoodgramTestCase, create_recipe
+
+FEED_URL = '/api/recipes/feed/'
+
+
+@override_settings(TIMELINE_FANOUT_LIMIT=1)
+@mock.patch('api.utils.workers.submit',
+            lambda function, *args: function(*args))
+class TimelineThresholdTest(FoodgramTestCase):
+    """
+    Лента, когда автор становится популярным и перестаёт им быть.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.author = self.users[1]
+        self.other = APIClient()
+        self.other.force_authenticate(self.users[3])
+
+    def feed(self):
+        response = self.client.get(FEED_URL, {'limit': 50})
+        self.assertEqual(response.status_code, 200)
+        ids = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(len(ids), len(set(ids)))
+        return ids
+
+    def publish(self):
+        recipe = create_recipe(self.author, self.tags[:1],
+                               self.ingredients[:1], 'Новый рецепт')
+        timeline.fan_out(recipe, User.objects.get(
+            pk=self.author.pk).followers_count)
+        return recipe
+
+    def subscribe(self, method):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = getattr(self.other, method)(
+                f'/api/users/{self.author.pk}/subscribe/')
+        self.assertLess(response.status_code, 300)
+
+    def test_crossing(self):
+        before = self.publish()
+        self.assertIn(before.id, self.feed())
+        # Автор становится популярным: рецепты читаются при запросе
+        self.subscribe('post')
+        popular = self.publish()
+        feed = self.feed()
+        self.assertIn(before.id, feed)
+        self.assertIn(popular.id, feed)
+        # Автор снова не популярен: рецепты раскладываются по лентам
+        self.subscribe('delete')
+        feed = self.feed()
+        self.assertIn(before.id, feed)
+        self.assertIn(popular.id, feed)
@@ -0,0 +1,90 @@
+import asyncio
+import re
+from unittest import mock
+
+from api import async_views
+from api.middleware import ServerTimingMiddleware
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Recipe, RecipeIngredient, Tag
+from rest_framework.authtoken.models import Token
+
+from .utils import FoodgramTestCase
+
+
+def queries_in_header(response):
+    return int(re.search(r'"(\d+) queries"', response['Server-Timing'])[1])
+
+
+class ServerTimingTest(FoodgramTestCase):
+    """
+    Заголовок Server-Timing и замер запросов под WSGI и ASGI.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user.is_staff = True
+
+    def test_header(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/api/recipes/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries_in_header(response),
+                         len(context.captured_queries))
+        self.assertNotIn('Server-Timing', self.anonymous.get('/api/recipes/'))
+
+    def test_concurrent_async_requests(self):
+        """
+        Запросы чередуются в одном цикле событий и выполняют
+        разное число запросов к базе; замеры не смешиваются.
+        """
+        first_done = asyncio.Event()
+
+        async def get_response(request):
+            queries = int(request.GET['queries'])
+            if queries == 1:
+                await first_done.wait()
+            for _ in range(queries):
+                await sync_to_async(Tag.objects.count)()
+            if queries == 3:
+                first_done.set()
+            return HttpResponse()
+
+        middleware = ServerTimingMiddleware(get_response)
+        factory = RequestFactory()
+
+        async def run():
+            requests = [
+                factory.get('/', {'queries': queries}) for queries in (1, 3)]
+            for request in requests:
+                request.user = self.user
+            return await asyncio.gather(*map(middleware, requests))
+
+        responses = async_to_sync(run)()
+        self.assertEqual(
+            [queries_in_header(response) for response in responses], [1, 3])
+
+
+class AsyncViewsTest(FoodgramTestCase):
+    """
+    Изменения рецепта через async-вью не идут в пул для чтения.
+    """
+
+    def test_write_bypasses_read_pool(self):
+        recipe = self.recipes[0]
+        Recipe.objects.filter(pk=recipe.pk).update(author=self.user)
+        token = Token.objects.create(user=self.user)
+        request = RequestFactory().delete(
+            f'/api/recipes/{recipe.pk}/',
+            HTTP_AUTHORIZATION=f'Token {token.key}')
+        with mock.patch.object(async_views, 'run_in_pool') as run_in_pool:
+            response = async_to_sync(async_views.recipe_detail)(
+                request, pk=recipe.pk)
+        self.assertEqual(response.status_code, 204)
+        run_in_pool.assert_not_called()
+        self.assertFalse(Recipe.objects.filter(pk=recipe.pk).exists())
+        self.assertFalse(
+            RecipeIngredient.objects.filter(recipe_id=recipe.pk).exists())
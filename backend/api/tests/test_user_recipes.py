@@ -0,0 +1,46 @@
+from unittest import mock
+
+from django.db import connection
+from recipes.models import Cart, Favorite
+
+from .utils import FoodgramTestCase
+
+
+class UserRecipesTest(FoodgramTestCase):
+    """
+    Добавление и удаление рецептов в избранное и корзину
+    с RETURNING и без него.
+    """
+
+    def check(self, model):
+        first, second, third = (recipe.id for recipe in self.recipes[:3])
+        missing = max(recipe.id for recipe in self.recipes) + 1
+        objects = model.objects
+        self.assertEqual(sorted(objects.add(self.user.id, [first, second])),
+                         [first, second])
+        self.assertEqual(
+            objects.add(self.user.id, [first, third, missing, third]),
+            [third])
+        self.assertEqual(objects.add(self.user.id, []), [])
+        self.assertEqual(objects.remove(self.user.id, [second, missing]),
+                         [second])
+        self.assertEqual(objects.remove(self.user.id, [second]), [])
+        self.assertEqual(
+            sorted(objects.filter(user=self.user).values_list(
+                'recipe_id', flat=True)),
+            [first, third])
+        self.assertTrue(all(objects.values_list('added', flat=True)))
+
+    def test_returning(self):
+        if not connection.features.can_return_columns_from_insert:
+            self.skipTest('RETURNING не поддерживается')
+        for model in (Favorite, Cart):
+            with self.subTest(model=model.__name__):
+                self.check(model)
+
+    def test_without_returning(self):
+        with mock.patch.object(connection.features,
+                               'can_return_columns_from_insert', False):
+            for model in (Favorite, Cart):
+                with self.subTest(model=model.__name__):
+                    self.check(model)
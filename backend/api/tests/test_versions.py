@@ -0,0 +1,105 @@
+from api.utils import ingredient_index, recipe_index
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from recipes.models import Ingredient, RecipeIngredient, Tag
+from recipes.versions import bump_version, get_version, get_versions
+
+from .utils import FoodgramTestCase, create_recipe, shared_cache
+
+DUMMY_CACHE = {'default': {
+    'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+@shared_cache
+class VersionTest(TestCase):
+    """
+    Версии тегов и ингредиентов меняются только после коммита.
+    """
+
+    def setUp(self):
+        cache.clear()
+
+    def assert_bumped_on_commit(self, name, change):
+        version = get_version(name)
+        with self.captureOnCommitCallbacks(execute=True):
+            change()
+            self.assertEqual(get_version(name), version)
+        self.assertNotEqual(get_version(name), version)
+
+    def test_tags(self):
+        self.assert_bumped_on_commit('tags', lambda: Tag.objects.create(
+            name='Завтрак', color='#E26C2D', slug='breakfast'))
+
+    def test_ingredients(self):
+        self.assert_bumped_on_commit(
+            'ingredients', lambda: Ingredient.objects.create(
+                name='Соль', measurement_unit='г'))
+
+
+class LocalCacheVersionTest(TestCase):
+    """
+    Без общего кеша версий нет.
+    """
+
+    def test_local_cache(self):
+        self.assertIsNone(get_version('tags'))
+        self.assertIsNone(get_versions(['tags']))
+
+    @override_settings(CACHES=DUMMY_CACHE)
+    def test_dummy_cache(self):
+        self.assertIsNone(get_version('tags'))
+        bump_version('tags')
+        self.assertIsNone(get_version('tags'))
+
+
+@override_settings(CACHES=DUMMY_CACHE)
+class DummyCacheTest(FoodgramTestCase):
+    """
+    С DummyCache списки, индексы и лента читаются из базы
+    и сразу видят изменения.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(setattr, ingredient_index, '_index', None)
+        self.addCleanup(setattr, recipe_index, '_index', None)
+
+    def test_tag_list(self):
+        response = self.anonymous.get('/api/tags/')
+        self.assertNotIn('ETag', response)
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+        response = self.anonymous.get('/api/tags/')
+        self.assertIn('breakfast', [tag['slug'] for tag in response.data])
+        response = self.anonymous.get('/api/recipes/', {'tags': 'breakfast'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_ingredient_search(self):
+        self.anonymous.get('/api/ingredients/', {'name': 'Соль'})
+        Ingredient.objects.create(name='Соль', measurement_unit='г')
+        response = self.anonymous.get('/api/ingredients/', {'name': 'Сол'})
+        self.assertEqual(
+            [item['name'] for item in response.data], ['Соль'])
+
+    def test_cook(self):
+        ingredient = self.ingredients[9]
+        params = {'ingredients': ingredient.id}
+        self.assertEqual(
+            self.client.get('/api/recipes/cook/', params).data['results'],
+            [])
+        RecipeIngredient.objects.create(
+            recipe=self.recipes[0], ingredient=ingredient, amount=1)
+        results = self.client.get(
+            '/api/recipes/cook/', params).data['results']
+        self.assertEqual([item['id'] for item in results],
+                         [self.recipes[0].id])
+        self.assertEqual(
+            (results[0]['matched_ingredients'],
+             results[0]['missing_ingredients']),
+            (1, self.recipes[0].ingredients.count() - 1))
+
+    def test_feed(self):
+        self.anonymous.get('/api/recipes/', {'limit': 6})
+        recipe = create_recipe(self.users[1], self.tags[:1],
+                               self.ingredients[:1], name='Новый')
+        response = self.anonymous.get('/api/recipes/', {'limit': 6})
+        self.assertEqual(response.data['results'][0]['id'], recipe.id)
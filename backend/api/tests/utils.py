@@ -0,0 +1,77 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from recipes.counters import reconcile
+from recipes.models import Ingredient, Recipe, RecipeIngredient, Tag
+from rest_framework.test import APIClient
+from users.models import Follow, User
+
+PNG = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAA'
+    'DUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg=='
+)
+
+
+# Тесты идут в одном процессе, поэтому локальный кеш в них
+# можно считать общим и проверять кеши по версии данных
+shared_cache = override_settings(LOCAL_CACHE_BACKENDS=())
+
+
+def create_user(number):
+    return User.objects.create_user(
+        username=f'user{number}', email=f'user{number}@example.com',
+        password='password', first_name='Имя', last_name='Фамилия')
+
+
+def create_recipe(author, tags, ingredients, name='Рецепт'):
+    recipe = Recipe.objects.create(
+        author=author, name=name, text='Описание', cooking_time=10,
+        image='recipes/images/test.png')
+    recipe.tags.set(tags)
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=amount)
+        for amount, ingredient in enumerate(ingredients, start=1)
+    )
+    return recipe
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class FoodgramTestCase(TestCase):
+    """
+    Пользователи, теги, ингредиенты и рецепты для тестов API.
+    Кеш очищается перед каждым тестом: версии справочников
+    и закешированные страницы не должны переходить между тестами.
+    Данные не закоммичены, поэтому все запросы идут в основную базу;
+    чтение с реплик проверяет test_replicas.
+    """
+    recipes_count = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [create_user(number) for number in range(4)]
+        cls.user = cls.users[0]
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {number}', color=f'#00000{number}',
+                               slug=f'tag{number}')
+            for number in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {number}',
+                                      measurement_unit='г')
+            for number in range(10)
+        ]
+        cls.recipes = [
+            create_recipe(
+                cls.users[1 + number % 3], cls.tags[:1 + number % 3],
+                cls.ingredients[number % 5:number % 5 + 3],
+                name=f'Рецепт {number}')
+            for number in range(cls.recipes_count)
+        ]
+        for author in cls.users[1:3]:
+            Follow.objects.create(user=cls.user, author=author)
+        reconcile()
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.anonymous = APIClient()
@@ -5,7 +5,8 @@ from rest_framework import permissions
 from rest_framework.routers import DefaultRouter
 
 from .views import (CustomUserViewSet, FollowListView, FollowViewSet,
-                    IngredientsViewSet, RecipeViewSet, TagsViewSet)
+                    IngredientsViewSet, RecipeViewSet, TagsViewSet,
+                    TimingView)
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -39,6 +40,7 @@ urlpatterns = [
         FollowViewSet.as_view(),
         name='subscribe'
     ),
+    path('timings/', TimingView.as_view(), name='timings'),
     path('', include(router_v1.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from recipes.models import ShoppingListJob
+
+from . import workers
+from .shopping_list import file_name, private_storage, render_file
+
+
+def get_job(job_id, user_id):
+    """
+    Задача пользователя или None, если её нет, она устарела
+    или принадлежит другому пользователю.
+    """
+    return ShoppingListJob.objects.filter(
+        pk=job_id, user_id=user_id,
+        created__gte=timezone.now() - timedelta(
+            seconds=settings.SHOPPING_LIST_JOB_TIMEOUT),
+    ).first()
+
+
+def render_job(job_id, name, file_format, ingredients):
+    storage = private_storage()
+    status = ShoppingListJob.FAILED
+    try:
+        if not storage.exists(name):
+            name = storage.save(
+                name, ContentFile(render_file(ingredients, file_format)))
+        status = ShoppingListJob.READY
+    finally:
+        ShoppingListJob.objects.filter(pk=job_id).update(
+            status=status, file=name)
+
+
+def start_job(user_id, ingredients, file_format):
+    """
+    Создаёт задачу выгрузки списка покупок.
+    Файл ищется в хранилище по хешу содержимого корзины: если такой
+    список уже собирали, задача сразу готова, иначе файл рисуется
+    в пуле фоновых потоков после коммита.
+    """
+    ingredients = list(ingredients)
+    name = file_name(ingredients, file_format)
+    job = ShoppingListJob.objects.create(
+        user_id=user_id, format=file_format, file=name,
+        status=(ShoppingListJob.READY if private_storage().exists(name)
+                else ShoppingListJob.PENDING),
+    )
+    if job.status == ShoppingListJob.PENDING:
+        transaction.on_commit(lambda: workers.submit(
+            render_job, job.pk, name, file_format, ingredients))
+    return job
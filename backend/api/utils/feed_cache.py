@@ -0,0 +1,91 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from recipes.versions import aget_versions, bump_version, get_versions
+
+CACHED_PARAMS = {'tags', 'author', 'page', 'limit', 'cursor'}
+ANY = '*'
+
+
+def scope(tag, author):
+    return f'recipes:{tag}:{author}'
+
+
+def get_scopes(params):
+    """
+    Версии, от которых зависит страница ленты с такими параметрами.
+    Возвращает None, если запрос кешировать нельзя.
+    """
+    if not CACHED_PARAMS.issuperset(params):
+        return None
+    authors = params.getlist('author')
+    if len(authors) > 1 or not all(author.isdigit() for author in authors):
+        return None
+    author = authors[0] if authors else ANY
+    tags = sorted(set(params.getlist('tags'))) or [ANY]
+    return [scope(tag, author) for tag in tags] + ['tags', 'ingredients']
+
+
+def make_key(host, params, versions):
+    parts = [
+        host, params.get('page', '1'), params.get('limit', ''),
+        params.get('cursor', '-'),
+        *(f'{name}={versions[name]}' for name in sorted(versions)),
+    ]
+    digest = hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+    return f'recipe-feed:{digest}'
+
+
+def get_cache_key(request):
+    """
+    Ключ кеша ленты рецептов для анонимного запроса.
+    Зависит от нормализованных параметров и версий областей
+    (тег, автор), которые затрагивает фильтр.
+    Возвращает None, если запрос кешировать нельзя
+    или версий нет (кеш не общий).
+    """
+    names = get_scopes(request.query_params)
+    if names is None:
+        return None
+    versions = get_versions(names)
+    if versions is None:
+        return None
+    return make_key(request.get_host(), request.query_params, versions)
+
+
+async def aget_cache_key(request):
+    """
+    То же, что get_cache_key, для HttpRequest в async-вью.
+    """
+    names = get_scopes(request.GET)
+    if names is None:
+        return None
+    versions = await aget_versions(names)
+    if versions is None:
+        return None
+    return make_key(request.get_host(), request.GET, versions)
+
+
+def load(key):
+    return cache.get(key)
+
+
+async def aload(key):
+    return await cache.aget(key)
+
+
+def store(key, data):
+    cache.set(key, data, settings.RECIPE_FEED_CACHE_TIMEOUT)
+
+
+def invalidate(tags, author_id):
+    """
+    Сбрасывает закешированные страницы, в которые мог попасть рецепт
+    с такими тегами и автором: фильтры по его тегам или без тегов
+    в сочетании с фильтром по его автору или без автора.
+    """
+    bump_version(*(
+        scope(tag, author)
+        for tag in [*tags, ANY] for author in (str(author_id), ANY)
+    ))
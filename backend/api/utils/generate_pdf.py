@@ -1,32 +1,56 @@
-from django.http import HttpResponse
+import io
+import os
+from functools import lru_cache
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfgen import canvas
 
+from .shopping_list import format_line
+
+FONT_NAME = 'Lemon'
+FONT_PATH = os.path.join(settings.BASE_DIR, 'data', 'Lemon.ttf')
+TITLE_SIZE = 24
+LINE_SIZE = 16
+LINE_HEIGHT = 25
+MARGIN_LEFT = 75
+MARGIN_TOP = 50
+MARGIN_BOTTOM = 50
+
+
+@lru_cache(maxsize=None)
+def register_font():
+    """
+    Регистрирует шрифт один раз на процесс.
+    """
+    pdfmetrics.registerFont(TTFont(FONT_NAME, FONT_PATH, 'UTF-8'))
+
 
-def get_shopping_cart(ingredients):
+def render_pdf(ingredients):
     """
     Функция для генерации pdf.
+    Рисует список в памяти и переносит строки на новую страницу,
+    когда текущая заканчивается.
     """
-    pdfmetrics.registerFont(
-        TTFont('Lemon', 'data/Lemon.ttf', 'UTF-8'))
-    # В доках reportlab pdf генерируют через HttpResponse
-    #  через File сделать не получилось..
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = ('attachment; '
-                                       'filename="shopping_list.pdf"')
-    page = canvas.Canvas('shopping_list.pdf')
-    page.setFont('Lemon', size=24)
-    page.drawString(200, 800, 'Список покупок')
-    page.setFont('Lemon', size=16)
-    height = 750
-    for value in ingredients:
-        page.drawString(75, height, (
-            value['ingredient__name'] + ' - '
-            + str(value['quantity']) + ' '
-            + value['ingredient__measurement_unit']
-        ))
-        height -= 25
+    register_font()
+    buffer = io.BytesIO()
+    width, height = A4
+    page = canvas.Canvas(buffer, pagesize=A4)
+    page.setFont(FONT_NAME, size=TITLE_SIZE)
+    page.drawCentredString(width / 2, height - MARGIN_TOP, 'Список покупок')
+    page.setFont(FONT_NAME, size=LINE_SIZE)
+    y = height - MARGIN_TOP - 2 * LINE_HEIGHT
+    for name, measurement_unit, amount in ingredients:
+        if y < MARGIN_BOTTOM:
+            page.showPage()
+            page.setFont(FONT_NAME, size=LINE_SIZE)
+            y = height - MARGIN_TOP
+        page.drawString(
+            MARGIN_LEFT, y, format_line(name, measurement_unit, amount))
+        y -= LINE_HEIGHT
     page.showPage()
     page.save()
-    return response
+    buffer.seek(0)
+    return buffer
@@ -0,0 +1,130 @@
+import hashlib
+import io
+import os
+from collections import defaultdict
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from recipes.models import Recipe
+from rest_framework import serializers
+
+from . import feed_cache, workers
+
+VARIANT_FORMAT = 'WEBP'
+VARIANT_QUALITY = 80
+VARIANTS = {
+    'image_thumbnail': ('thumbnail', (320, 320)),
+    'image_medium': ('medium', (960, 960)),
+}
+
+
+class HashedBase64ImageField(Base64ImageField):
+    """
+    Картинка в base64, сохраняемая под именем из хеша содержимого.
+    Если такой файл уже загружен, возвращается его путь,
+    и повторной записи не происходит.
+    """
+
+    def __init__(self, upload_to, **kwargs):
+        self.upload_to = upload_to
+        super().__init__(**kwargs)
+
+    def get_file_name(self, decoded_file):
+        return hashlib.sha256(decoded_file).hexdigest()
+
+    def to_internal_value(self, base64_data):
+        file = super().to_internal_value(base64_data)
+        if file is None:
+            return file
+        name = os.path.join(self.upload_to, file.name)
+        if default_storage.exists(name):
+            return name
+        return file
+
+
+class ImageVariantField(serializers.ImageField):
+    """
+    Ссылка на уменьшенную копию картинки рецепта.
+    Пока копия не готова, отдаётся оригинал.
+    """
+
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return getattr(instance, self.variant) or instance.image
+
+
+def variant_names(name):
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return {
+        field: os.path.join(
+            directory, folder, f'{stem}.{VARIANT_FORMAT.lower()}')
+        for field, (folder, _) in VARIANTS.items()
+    }
+
+
+def generate_variants(name):
+    """
+    Создаёт недостающие уменьшенные копии картинки и проставляет их
+    всем рецептам с этой картинкой. Закешированная лента этих рецептов
+    сбрасывается после коммита, чтобы в ней появились ссылки на копии.
+    """
+    names = variant_names(name)
+    missing = {
+        field: variant for field, variant in names.items()
+        if not default_storage.exists(variant)
+    }
+    if missing:
+        with default_storage.open(name, 'rb') as file:
+            original = Image.open(file)
+            original.load()
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA')
+        for field, variant in missing.items():
+            image = original.copy()
+            image.thumbnail(VARIANTS[field][1], Image.LANCZOS)
+            buffer = io.BytesIO()
+            image.save(buffer, VARIANT_FORMAT, quality=VARIANT_QUALITY,
+                       method=4)
+            default_storage.save(variant, ContentFile(buffer.getvalue()))
+    with transaction.atomic():
+        recipes = Recipe.objects.filter(image=name)
+        tags = defaultdict(set)
+        for author_id, slug in recipes.values_list(
+                'author_id', 'tags__slug').order_by():
+            tags[author_id].update([slug] if slug else [])
+        recipes.update(**names)
+        for author_id, slugs in tags.items():
+            transaction.on_commit(
+                lambda slugs=slugs, author_id=author_id:
+                feed_cache.invalidate(slugs, author_id))
+
+
+def process_recipe_image(recipe):
+    """
+    Привязывает к рецепту уменьшенные копии картинки.
+    Готовые копии проставляются сразу, остальные создаются
+    в фоновом потоке после коммита транзакции.
+    """
+    if not recipe.image:
+        return
+    name = recipe.image.name
+    names = variant_names(name)
+    if all(getattr(recipe, field) == variant
+           for field, variant in names.items()):
+        return
+    if all(default_storage.exists(variant) for variant in names.values()):
+        fields = names
+    else:
+        fields = dict.fromkeys(names)
+        transaction.on_commit(lambda: workers.submit(generate_variants, name))
+    Recipe.objects.filter(pk=recipe.pk).update(**fields)
+    for field, value in fields.items():
+        setattr(recipe, field, value)
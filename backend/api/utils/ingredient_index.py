@@ -0,0 +1,90 @@
+import bisect
+import threading
+
+from django.db.models.functions import Lower
+from recipes.models import Ingredient
+from recipes.versions import get_version
+
+
+class IngredientPrefixIndex:
+    """
+    Отсортированный индекс ингредиентов по названию без учёта регистра.
+    Поиск по префиксу - бинарный поиск и проход по соседним записям.
+    """
+
+    def __init__(self, rows):
+        entries = sorted(
+            (name.casefold(), pk, name, measurement_unit)
+            for pk, name, measurement_unit in rows
+        )
+        self.keys = [key for key, *_ in entries]
+        self.items = [
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, pk, name, measurement_unit in entries
+        ]
+
+    def __len__(self):
+        return len(self.keys)
+
+    def search(self, prefix, limit):
+        """
+        Ингредиенты, название которых начинается с prefix.
+        Точное совпадение при сортировке оказывается первым,
+        за ним идут остальные совпадения по алфавиту.
+        """
+        prefix = prefix.casefold()
+        position = bisect.bisect_left(self.keys, prefix)
+        result = []
+        while (len(result) < limit and position < len(self.keys)
+               and self.keys[position].startswith(prefix)):
+            result.append(self.items[position])
+            position += 1
+        return result
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def get_index():
+    """
+    Индекс строится при первом обращении в каждом процессе
+    и перестраивается, когда меняется версия каталога ингредиентов.
+    Без версии (нет общего кеша) индекс не строится - None.
+    """
+    global _index
+    version = get_version('ingredients')
+    if version is None:
+        return None
+    cached = _index
+    if cached is None or cached[0] != version:
+        with _lock:
+            cached = _index
+            if cached is None or cached[0] != version:
+                cached = _index = (version, IngredientPrefixIndex(
+                    Ingredient.objects.values_list(
+                        'id', 'name', 'measurement_unit').iterator()
+                ))
+    return cached[1]
+
+
+def get_cached(version):
+    """
+    Индекс, если он уже построен для этой версии каталога, иначе None.
+    Не обращается к базе, поэтому годится для async-вью.
+    """
+    cached = _index
+    if version is not None and cached is not None and cached[0] == version:
+        return cached[1]
+    return None
+
+
+def search(prefix, limit):
+    index = get_index()
+    if index is not None:
+        return index.search(prefix, limit)
+    return list(
+        Ingredient.objects.filter(name__istartswith=prefix)
+        .order_by(Lower('name'), 'id')
+        .values('id', 'name', 'measurement_unit')[:limit]
+    )
@@ -0,0 +1,127 @@
+import threading
+from array import array
+from collections import Counter
+from itertools import groupby
+
+from django.db.models import Count, Q
+from recipes.models import Recipe, RecipeIngredient
+from recipes.versions import get_version
+
+from . import workers
+
+VERSION = 'recipe_ingredients'
+
+
+class RecipeIngredientIndex:
+    """
+    Обратный индекс: для каждого ингредиента - отсортированный массив
+    id рецептов (array('I') - четыре байта на рецепт), и число
+    ингредиентов каждого рецепта.
+    """
+
+    def __init__(self, rows):
+        self.recipes = {}
+        self.required = Counter()
+        for ingredient_id, group in groupby(rows, key=lambda row: row[0]):
+            recipe_ids = array('I', sorted({
+                recipe_id for _, recipe_id in group}))
+            self.recipes[ingredient_id] = recipe_ids
+            self.required.update(recipe_ids)
+
+    def __len__(self):
+        return len(self.required)
+
+    def match(self, ingredient_ids, max_missing=None):
+        """
+        Рецепты, в которых есть хотя бы один из ингредиентов,
+        кортежами (id, совпало, не хватает): сначала те, где
+        не хватает меньше всего, затем по числу совпадений и новизне.
+        """
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(self.recipes.get(ingredient_id, ()))
+        result = [
+            (recipe_id, count, self.required[recipe_id] - count)
+            for recipe_id, count in matched.items()
+        ]
+        if max_missing is not None:
+            result = [row for row in result if row[2] <= max_missing]
+        result.sort(key=lambda row: (row[2], -row[1], -row[0]))
+        return result
+
+
+_index = None
+_lock = threading.Lock()
+_building = False
+
+
+def build():
+    return RecipeIngredientIndex(
+        RecipeIngredient.objects.order_by('ingredient_id').values_list(
+            'ingredient_id', 'recipe_id').iterator()
+    )
+
+
+def rebuild(version):
+    global _index, _building
+    try:
+        _index = (version, build())
+    finally:
+        _building = False
+
+
+def get_index():
+    """
+    Индекс строится при первом обращении в каждом процессе.
+    Когда меняется версия состава рецептов, индекс перестраивается
+    в фоновом потоке, а запросы до конца перестройки получают старый.
+    Версия берётся до чтения данных: изменения во время перестройки
+    поменяют её ещё раз и запустят следующую.
+    Без версии (нет общего кеша) индекс не строится - None.
+    """
+    global _index, _building
+    version = get_version(VERSION)
+    if version is None:
+        return None
+    cached = _index
+    if cached is None:
+        with _lock:
+            if _index is None:
+                _index = (version, build())
+            return _index[1]
+    if cached[0] != version:
+        with _lock:
+            start, _building = not _building, True
+        if start:
+            workers.submit(rebuild, version)
+    return cached[1]
+
+
+def query_matches(ingredient_ids, max_missing=None):
+    """
+    То же, что RecipeIngredientIndex.match, одним запросом к базе.
+    """
+    ingredient_ids = set(ingredient_ids)
+    rows = Recipe.objects.filter(pk__in=RecipeIngredient.objects.filter(
+        ingredient_id__in=ingredient_ids).values('recipe_id')
+    ).order_by().annotate(
+        matched=Count('RecipeIngredient__ingredient', distinct=True,
+                      filter=Q(RecipeIngredient__ingredient_id__in=(
+                          ingredient_ids))),
+        required=Count('RecipeIngredient__ingredient', distinct=True),
+    ).values_list('id', 'matched', 'required')
+    result = [
+        (recipe_id, matched, required - matched)
+        for recipe_id, matched, required in rows
+    ]
+    if max_missing is not None:
+        result = [row for row in result if row[2] <= max_missing]
+    result.sort(key=lambda row: (row[2], -row[1], -row[0]))
+    return result
+
+
+def match(ingredient_ids, max_missing=None):
+    index = get_index()
+    if index is None:
+        return query_matches(ingredient_ids, max_missing)
+    return index.match(ingredient_ids, max_missing)
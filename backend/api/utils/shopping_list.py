@@ -0,0 +1,99 @@
+import csv
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, StreamingHttpResponse
+
+FILENAME = 'shopping_list'
+STORAGE_DIR = 'shopping_lists'
+CONTENT_TYPES = {
+    'txt': 'text/plain; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+    'pdf': 'application/pdf',
+}
+
+
+def private_storage():
+    """
+    Хранилище готовых списков покупок в PRIVATE_MEDIA_ROOT:
+    без публичного адреса, файлы отдаёт только get_stored_file.
+    """
+    return FileSystemStorage(location=settings.PRIVATE_MEDIA_ROOT)
+
+
+def format_line(name, measurement_unit, amount):
+    return f'{name} - {amount} {measurement_unit}'
+
+
+def iter_txt(ingredients):
+    yield 'Список покупок\n\n'
+    for name, measurement_unit, amount in ingredients:
+        yield format_line(name, measurement_unit, amount) + '\n'
+
+
+def iter_csv(ingredients):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(('name', 'measurement_unit', 'amount'))
+    for row in ingredients:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_lines(ingredients, file_format):
+    if file_format == 'csv':
+        return iter_csv(ingredients)
+    return iter_txt(ingredients)
+
+
+def render_file(ingredients, file_format):
+    """
+    Готовый файл списка покупок в байтах.
+    """
+    if file_format == 'pdf':
+        from .generate_pdf import render_pdf
+        return render_pdf(ingredients).getvalue()
+    return ''.join(iter_lines(ingredients, file_format)).encode('utf-8')
+
+
+def file_name(ingredients, file_format):
+    """
+    Имя файла в хранилище: хеш содержимого корзины и формат.
+    Неизменная корзина даёт то же имя, любое изменение - новое.
+    """
+    digest = hashlib.sha256(
+        repr(list(ingredients)).encode('utf-8')).hexdigest()
+    return f'{STORAGE_DIR}/{digest}.{file_format}'
+
+
+def get_shopping_cart(ingredients, file_format='pdf'):
+    """
+    Ответ со списком покупок в формате txt, csv или pdf.
+    Ингредиенты передаются кортежами (название, единица, количество).
+    txt и csv отдаются потоком без reportlab, pdf собирается в памяти.
+    """
+    filename = f'{FILENAME}.{file_format}'
+    if file_format == 'pdf':
+        from .generate_pdf import render_pdf
+        return FileResponse(
+            render_pdf(ingredients), as_attachment=True, filename=filename,
+            content_type=CONTENT_TYPES[file_format]
+        )
+    response = StreamingHttpResponse(
+        iter_lines(ingredients, file_format),
+        content_type=CONTENT_TYPES[file_format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def get_stored_file(name, file_format):
+    return FileResponse(
+        private_storage().open(name, 'rb'), as_attachment=True,
+        filename=f'{FILENAME}.{file_format}',
+        content_type=CONTENT_TYPES[file_format]
+    )
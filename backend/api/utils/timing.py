@@ -0,0 +1,160 @@
+import math
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from django.conf import settings
+
+METRICS = ('total', 'db', 'queries', 'app', 'render')
+
+
+current_timing = ContextVar('current_timing', default=None)
+
+
+def track_query(execute, sql, params, many, context):
+    """
+    execute_wrapper, который постоянно стоит на каждом соединении
+    и передаёт запрос замеру текущего запроса из current_timing.
+    Контекстные переменные переходят в потоки sync_to_async и пула
+    чтения, поэтому одновременные запросы ASGI не смешиваются.
+    """
+    timing = current_timing.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    return timing(execute, sql, params, many, context)
+
+
+def install(connection):
+    if track_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(track_query)
+
+
+class RequestTiming:
+    """
+    Замеры одного запроса.
+    Через track_query считает запросы и время SQL;
+    middleware отмечает начало вью и границы рендеринга ответа.
+    """
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.queries = 0
+        self.sql = 0.0
+        self.view_start = self.render_start = self.render_end = None
+        self.sql_at_view = self.sql_at_render = 0.0
+        self.total = None
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql += time.perf_counter() - start
+
+    def start_view(self):
+        self.view_start = time.perf_counter()
+        self.sql_at_view = self.sql
+
+    def start_render(self):
+        self.render_start = time.perf_counter()
+        self.sql_at_render = self.sql
+
+    def finish_render(self):
+        self.render_end = time.perf_counter()
+
+    def finish(self):
+        self.total = time.perf_counter() - self.start
+
+    def metrics(self):
+        """
+        Времена в миллисекундах.
+        app - работа вью без SQL: во вью DRF выполняет и сериализацию,
+        render - рендеринг ответа, total - весь запрос с middleware.
+        """
+        view_end = self.render_start or self.start + self.total
+        app = render = 0.0
+        if self.view_start is not None:
+            app = view_end - self.view_start - (
+                (self.sql_at_render if self.render_start else self.sql)
+                - self.sql_at_view)
+        if self.render_start and self.render_end:
+            render = self.render_end - self.render_start
+        return {
+            'total': self.total * 1000,
+            'db': self.sql * 1000,
+            'queries': self.queries,
+            'app': max(app, 0.0) * 1000,
+            'render': render * 1000,
+        }
+
+
+def server_timing(metrics):
+    return ', '.join((
+        f'db;dur={metrics["db"]:.2f};desc="{metrics["queries"]} queries"',
+        f'app;dur={metrics["app"]:.2f}',
+        f'render;dur={metrics["render"]:.2f}',
+        f'total;dur={metrics["total"]:.2f}',
+    ))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class RouteStats:
+    """
+    Скользящая статистика маршрута по последним window запросам.
+    """
+
+    def __init__(self, window):
+        self.count = 0
+        self.samples = deque(maxlen=window)
+
+    def add(self, metrics):
+        self.count += 1
+        self.samples.append(tuple(metrics[name] for name in METRICS))
+
+    def summary(self):
+        columns = zip(*self.samples)
+        return {
+            'count': self.count,
+            'window': len(self.samples),
+            **{
+                name: {
+                    'mean': round(sum(values) / len(values), 3),
+                    'p95': round(percentile(values, 0.95), 3),
+                }
+                for name, values in zip(METRICS, columns)
+            },
+        }
+
+
+_lock = threading.Lock()
+_routes = {}
+
+
+def record(route, metrics):
+    with _lock:
+        stats = _routes.get(route)
+        if stats is None:
+            stats = _routes[route] = RouteStats(settings.SERVER_TIMING_WINDOW)
+        stats.add(metrics)
+
+
+def snapshot():
+    """
+    Агрегаты по маршрутам текущего процесса, самые медленные первыми.
+    """
+    with _lock:
+        summaries = {
+            route: stats.summary() for route, stats in _routes.items()}
+    return dict(sorted(summaries.items(),
+                       key=lambda item: -item[1]['total']['p95']))
+
+
+def reset():
+    with _lock:
+        _routes.clear()
@@ -0,0 +1,58 @@
+import asyncio
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.BACKGROUND_WORKERS,
+    thread_name_prefix='foodgram-worker',
+)
+read_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_READ_WORKERS,
+    thread_name_prefix='foodgram-read',
+)
+
+
+def run(function, *args):
+    try:
+        return function(*args)
+    except Exception:
+        logger.exception('Фоновая задача %s завершилась ошибкой', function)
+        raise
+    finally:
+        connections.close_all()
+
+
+def submit(function, *args):
+    """
+    Выполняет функцию в пуле фоновых потоков процесса.
+    """
+    return executor.submit(run, function, *args)
+
+
+def run_read(function, *args):
+    try:
+        return function(*args)
+    finally:
+        # Как в конце обычного запроса: соединение закрывается
+        # или остаётся жить согласно CONN_MAX_AGE
+        close_old_connections()
+
+
+async def run_in_pool(function, *args):
+    """
+    Выполняет синхронный код async-вью (ORM, DRF) в пуле потоков
+    для чтения. Размер пула ограничивает число соединений с базой,
+    которые один процесс ASGI держит одновременно.
+    """
+    loop = asyncio.get_running_loop()
+    # run_in_executor не переносит contextvars, а от них зависит
+    # выбор базы в ReplicaRouter
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        read_executor, context.run, run_read, function, *args)
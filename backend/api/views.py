@@ -1,49 +1,73 @@
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import OuterRef, Prefetch, Subquery, Value
+from django.http import Http404
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from recipes.models import (Cart, Favorite, Ingredient, Recipe,
-                            RecipeIngredient, Tag)
+from recipes import timeline
+from recipes.counters import RECIPE_COUNTERS, change_counter, change_counters
+from recipes.models import (Cart, CartIngredient, Favorite, Ingredient,
+                            PopularRecipe, Recipe, ShoppingListJob, Tag)
 from rest_framework import status
 from rest_framework.decorators import action
 from rest_framework.generics import ListAPIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from users.models import Follow, User
 
 from .filters import IngredientsSearchFilter, RecipeFilter
-from .pagination import LimitPageNumberPagination
-from .permissions import AdminOrReadOnly, AuthorOrModeratorOrAdmin
-from .serializers import (CustomUserSerializer, FollowSerializer,
-                          IngredientSerializer, RecipeReadSerializer,
-                          RecipeWriteSerializer, ShortRecipeSerializer,
-                          TagSerializer)
-from .utils.generate_pdf import get_shopping_cart
+from .mixins import CursorPaginationMixin, VersionedListMixin
+from .pagination import (LimitPageNumberPagination, PopularPagination,
+                         TimelinePagination)
+from .permissions import (AdminOrReadOnly, AuthorOrModeratorOrAdmin,
+                          IsAdministrator)
+from .renderers import (CSVRenderer, PDFRenderer, PlainTextRenderer,
+                        ShoppingListRenderer)
+from .serializers import (CookSerializer, CustomUserSerializer,
+                          FollowSerializer, IngredientSerializer,
+                          RecipeIdsSerializer, RecipeReadSerializer,
+                          RecipeWriteSerializer, ShoppingListJobSerializer,
+                          ShortRecipeSerializer, TagSerializer)
+from .utils import (export_jobs, feed_cache, ingredient_index,
+                    recipe_index, timing, workers)
+from .utils.shopping_list import (CONTENT_TYPES, file_name,
+                                  get_shopping_cart, get_stored_file,
+                                  private_storage)
 
 
-class TagsViewSet(ReadOnlyModelViewSet):
+class TagsViewSet(VersionedListMixin, ReadOnlyModelViewSet):
     """
     Вьюсет для тегов.
     """
+    version_name = 'tags'
     queryset = Tag.objects.all()
     permission_classes = (AllowAny,)
     serializer_class = TagSerializer
 
 
-class IngredientsViewSet(ReadOnlyModelViewSet):
+class IngredientsViewSet(VersionedListMixin, ReadOnlyModelViewSet):
     """
     Вьюсет для ингредиентов.
     """
+    version_name = 'ingredients'
     queryset = Ingredient.objects.all()
     permission_classes = (AdminOrReadOnly, )
     serializer_class = IngredientSerializer
     filter_backends = (IngredientsSearchFilter, )
     search_fields = ('^name',)
+    search_limit = 50
 
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get(IngredientsSearchFilter.search_param)
+        if not name:
+            return super().list(request, *args, **kwargs)
+        return Response(ingredient_index.search(name, self.search_limit))
 
-class RecipeViewSet(ModelViewSet):
+
+class RecipeViewSet(CursorPaginationMixin, ModelViewSet):
     """
     Вьюсет для рецептов.
     """
@@ -52,12 +76,139 @@ class RecipeViewSet(ModelViewSet):
     filter_backends = (DjangoFilterBackend, )
     filterset_class = RecipeFilter
     pagination_class = LimitPageNumberPagination
+    cursor_ordering = ('-pub_date', '-id')
+
+    read_actions = ('list', 'retrieve', 'popular', 'cook', 'feed')
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        # Ошибки выгрузки списка покупок (401, 404, 406) - это JSON,
+        # а не тело с типом выбранного файла
+        if response.status_code >= status.HTTP_400_BAD_REQUEST and isinstance(
+                getattr(request, 'accepted_renderer', None),
+                ShoppingListRenderer):
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def get_queryset(self):
+        if self.action in self.read_actions:
+            return Recipe.objects.with_user_data(self.request.user)
+        return Recipe.objects.all()
 
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action in self.read_actions:
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
+    def list(self, request, *args, **kwargs):
+        key = None
+        if request.user.is_anonymous:
+            key = feed_cache.get_cache_key(request)
+        if key is None:
+            return super().list(request, *args, **kwargs)
+        data = feed_cache.load(key)
+        if data is None:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            feed_cache.store(key, data)
+        return Response(data)
+
+    @action(detail=False, methods=['get'])
+    def popular(self, request):
+        """
+        Рецепты по рейтингу rank_popular_recipes с фильтрами ленты.
+        Пока рейтинг не рассчитан, порядок берётся из счётчиков
+        избранного и корзин за всё время.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        if PopularRecipe.objects.exists():
+            queryset = queryset.filter(
+                popularity__isnull=False).order_by('popularity__rank')
+        else:
+            queryset = queryset.order_by(
+                '-favorites_count', '-in_carts_count', '-id')
+        paginator = PopularPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'],
+            permission_classes=(IsAuthenticated, ))
+    def feed(self, request):
+        """
+        Рецепты авторов из подписок, новые первыми, по курсору.
+        """
+        paginator = TimelinePagination()
+        rows = timeline.read(
+            request.user.id, paginator.get_page_size(request) + 1,
+            paginator.decode_position(request))
+        page = paginator.paginate_rows(rows, request)
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for _, recipe_id in page])
+        serializer = self.get_serializer(
+            [recipes[recipe_id] for _, recipe_id in page
+             if recipe_id in recipes],
+            many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def cook(self, request):
+        """
+        Рецепты из имеющихся ингредиентов (?ingredients=1&ingredients=2).
+        Подбор идёт по обратному индексу в памяти процесса, из базы
+        читается только страница ответа (без общего кеша подбор
+        тоже идёт запросом к базе). max_missing ограничивает
+        число недостающих ингредиентов.
+        """
+        serializer = CookSerializer(data={
+            'ingredients': request.query_params.getlist('ingredients'),
+            'max_missing': request.query_params.get('max_missing'),
+        })
+        serializer.is_valid(raise_exception=True)
+        matches = recipe_index.match(
+            serializer.validated_data['ingredients'],
+            serializer.validated_data.get('max_missing'))
+        paginator = PopularPagination()
+        page = paginator.paginate_queryset(matches, request, view=self)
+        recipes = self.get_queryset().in_bulk([row[0] for row in page])
+        data = self.get_serializer(
+            [recipes[row[0]] for row in page if row[0] in recipes],
+            many=True).data
+        coverage = {row[0]: row[1:] for row in page}
+        for item in data:
+            item['matched_ingredients'], item['missing_ingredients'] = (
+                coverage[item['id']])
+        return paginator.get_paginated_response(data)
+
+    @staticmethod
+    def invalidate_feed(recipe, tags=()):
+        tags = {*tags, *recipe.tags.values_list('slug', flat=True)}
+        author_id = recipe.author_id
+        transaction.on_commit(
+            lambda: feed_cache.invalidate(tags, author_id))
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self.invalidate_feed(serializer.instance)
+
+    def perform_update(self, serializer):
+        tags = list(serializer.instance.tags.values_list('slug', flat=True))
+        super().perform_update(serializer)
+        self.invalidate_feed(serializer.instance, tags)
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        CartIngredient.objects.apply_recipe(
+            Cart.objects.filter(recipe=instance).values_list(
+                'user_id', flat=True),
+            instance.id, sign=-1
+        )
+        self.invalidate_feed(instance)
+        change_counter(User, instance.author_id, 'recipes_count', -1)
+        instance.delete()
+
     @action(
         detail=True,
         methods=('post', 'delete'),
@@ -68,23 +219,79 @@ class RecipeViewSet(ModelViewSet):
             return self.add_to(Favorite, request.user, pk)
         return self.delete_from(Favorite, request.user, pk)
 
+    @staticmethod
+    def apply_changes(model, user, recipe_ids, sign):
+        change_counters(Recipe, recipe_ids, RECIPE_COUNTERS[model], sign)
+        if model is Cart:
+            CartIngredient.objects.apply_recipes([user.id], recipe_ids, sign)
+
+    @staticmethod
+    def parse_pk(pk):
+        try:
+            return int(pk)
+        except ValueError:
+            raise Http404
+
+    @transaction.atomic
     def add_to(self, model, user, pk):
-        if model.objects.filter(user=user, recipe__id=pk).exists():
+        pk = self.parse_pk(pk)
+        added = model.objects.add(user.id, [pk])
+        if not added:
+            get_object_or_404(Recipe, id=pk)
             return Response({'errors': 'Рецепт уже добавлен'},
                             status=status.HTTP_400_BAD_REQUEST)
-        recipe = get_object_or_404(Recipe, id=pk)
-        model.objects.create(user=user, recipe=recipe)
-        serializer = ShortRecipeSerializer(recipe)
+        self.apply_changes(model, user, added, 1)
+        serializer = ShortRecipeSerializer(Recipe.objects.get(id=pk))
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def delete_from(self, model, user, pk):
-        obj = model.objects.filter(user=user, recipe__id=pk)
-        if obj.exists():
-            obj.delete()
+        removed = model.objects.remove(user.id, [self.parse_pk(pk)])
+        if removed:
+            self.apply_changes(model, user, removed, -1)
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response({'errors': 'Рецепт уже удален'},
                         status=status.HTTP_204_NO_CONTENT)
 
+    @transaction.atomic
+    def change_many(self, model, request):
+        """
+        Добавляет или удаляет список рецептов одним запросом к базе.
+        В ответе - изменённые и пропущенные (уже добавленные,
+        уже удалённые или несуществующие) id.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        if request.method == 'POST':
+            changed = model.objects.add(request.user.id, recipe_ids)
+            self.apply_changes(model, request.user, changed, 1)
+        else:
+            changed = model.objects.remove(request.user.id, recipe_ids)
+            self.apply_changes(model, request.user, changed, -1)
+        return Response({
+            'recipes': sorted(changed),
+            'skipped': sorted(set(recipe_ids) - set(changed)),
+        })
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='favorite',
+        permission_classes=(IsAuthenticated,)
+    )
+    def favorite_bulk(self, request):
+        return self.change_many(Favorite, request)
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='shopping_cart',
+        permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_bulk(self, request):
+        return self.change_many(Cart, request)
+
     @action(
         detail=True,
         methods=('post', 'delete'),
@@ -95,15 +302,79 @@ class RecipeViewSet(ModelViewSet):
             return self.add_to(Cart, request.user, pk)
         return self.delete_from(Cart, request.user, pk)
 
+    @staticmethod
+    def get_cart_ingredients(user):
+        return CartIngredient.objects.filter(
+            user=user, amount__gt=0).values_list(
+                'ingredient__name', 'ingredient__measurement_unit', 'amount')
+
     @action(detail=False, methods=['get'],
-            permission_classes=(IsAuthenticated, ))
+            permission_classes=(IsAuthenticated, ),
+            renderer_classes=(PDFRenderer, PlainTextRenderer, CSVRenderer,
+                              JSONRenderer))
     def download_shopping_cart(self, request):
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__cart__user=request.user).values(
-                'ingredient__name', 'ingredient__measurement_unit').annotate(
-                    quantity=Sum('amount')
-        )
-        return (get_shopping_cart(ingredients))
+        file_format = request.accepted_renderer.format
+        if file_format not in CONTENT_TYPES:
+            file_format = 'pdf'
+        ingredients = self.get_cart_ingredients(request.user)
+        if file_format != 'pdf':
+            return get_shopping_cart(ingredients.iterator(), file_format)
+        # pdf собирается в памяти целиком, поэтому сначала ищется
+        # готовый файл той же корзины от фоновой выгрузки
+        ingredients = list(ingredients)
+        name = file_name(ingredients, file_format)
+        if private_storage().exists(name):
+            return get_stored_file(name, file_format)
+        return get_shopping_cart(ingredients, file_format)
+
+    def get_job_data(self, job):
+        data = {'id': job.pk.hex, 'format': job.format,
+                'status': job.status}
+        if job.status == ShoppingListJob.READY:
+            data['file'] = self.reverse_action(
+                'shopping-cart-job-file', kwargs={'job_id': job.pk.hex})
+        return data
+
+    def get_job(self, request, job_id):
+        job = export_jobs.get_job(job_id, request.user.id)
+        if job is None:
+            raise Http404
+        return job
+
+    @action(detail=False, methods=['post'],
+            url_path='download_shopping_cart/jobs',
+            permission_classes=(IsAuthenticated, ))
+    def shopping_cart_jobs(self, request):
+        """
+        Запуск фоновой выгрузки списка покупок.
+        """
+        serializer = ShoppingListJobSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = export_jobs.start_job(
+            request.user.id, self.get_cart_ingredients(request.user),
+            serializer.validated_data['format'])
+        return Response(self.get_job_data(job),
+                        status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'],
+            url_path=r'download_shopping_cart/jobs/(?P<job_id>[0-9a-f]{32})',
+            permission_classes=(IsAuthenticated, ))
+    def shopping_cart_job(self, request, job_id):
+        job = self.get_job(request, job_id)
+        return Response(self.get_job_data(job))
+
+    @action(detail=False, methods=['get'],
+            url_path=(r'download_shopping_cart/jobs/'
+                      r'(?P<job_id>[0-9a-f]{32})/file'),
+            permission_classes=(IsAuthenticated, ),
+            renderer_classes=(JSONRenderer, PDFRenderer, PlainTextRenderer,
+                              CSVRenderer))
+    def shopping_cart_job_file(self, request, job_id):
+        job = self.get_job(request, job_id)
+        if job.status != ShoppingListJob.READY:
+            return Response(self.get_job_data(job),
+                            status=status.HTTP_409_CONFLICT)
+        return get_stored_file(job.file, job.format)
 
 
 class CustomUserViewSet(UserViewSet):
@@ -123,6 +394,7 @@ class FollowViewSet(APIView):
     permission_classes = (IsAuthenticated, )
     pagination_class = LimitPageNumberPagination
 
+    @transaction.atomic
     def post(self, request, *args, **kwargs):
         user_id = self.kwargs.get('user_id')
         if user_id == request.user.id:
@@ -143,11 +415,15 @@ class FollowViewSet(APIView):
             user=request.user,
             author_id=user_id
         )
+        change_counter(User, user_id, 'followers_count')
+        author.followers_count += 1
+        timeline.backfill(request.user.id, author)
         return Response(
             self.serializer_class(author, context={'request': request}).data,
             status=status.HTTP_201_CREATED
         )
 
+    @transaction.atomic
     def delete(self, request, *args, **kwargs):
         user_id = self.kwargs.get('user_id')
         get_object_or_404(User, id=user_id)
@@ -156,7 +432,12 @@ class FollowViewSet(APIView):
             author_id=user_id
         )
         if subscription:
-            subscription.delete()
+            deleted, _ = subscription.delete()
+            change_counter(User, user_id, 'followers_count', -deleted)
+            timeline.forget(request.user.id, user_id)
+            if timeline.became_fanned_out(user_id, deleted):
+                transaction.on_commit(
+                    lambda: workers.submit(timeline.refill, user_id))
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {'error': 'Вы не подписаны на этого пользователя'},
@@ -164,14 +445,47 @@ class FollowViewSet(APIView):
         )
 
 
-class FollowListView(ListAPIView):
+class FollowListView(CursorPaginationMixin, ListAPIView):
     """
     Вьюсет для отображения подписок.
     """
     serializer_class = FollowSerializer
     permission_classes = (IsAuthenticated, )
     pagination_class = LimitPageNumberPagination
+    cursor_ordering = ('id',)
 
     def get_queryset(self):
-        user = self.request.user
-        return Follow.objects.filter(user=user)
+        recipes = Recipe.objects.only(
+            'id', 'name', 'image', 'image_thumbnail', 'cooking_time',
+            'author')
+        limit = FollowSerializer.get_recipes_limit(self.request)
+        if limit is not None:
+            # Первые recipes_limit рецептов каждого автора страницы
+            # выбираются одним запросом через коррелированный подзапрос.
+            recipes = recipes.filter(id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('id')[:limit]
+            ))
+        return User.objects.filter(
+            following__user=self.request.user
+        ).annotate(
+            is_subscribed=Value(True),
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='short_recipes')
+        ).order_by('id')
+
+
+class TimingView(APIView):
+    """
+    Агрегаты времени ответа по маршрутам текущего процесса.
+    DELETE сбрасывает накопленную статистику.
+    """
+    permission_classes = (IsAdministrator, )
+
+    def get(self, request):
+        return Response(timing.snapshot())
+
+    def delete(self, request):
+        timing.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -35,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -46,7 +47,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
 ]
 
-ROOT_URLCONF = 'backend.urls'
+# backend/asgi.py подставляет backend.asgi_urls с async-вью
+ROOT_URLCONF = os.getenv('ROOT_URLCONF', default='backend.urls')
 
 TEMPLATES = [
     {
@@ -80,6 +82,46 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения через запятую: хосты, а для SQLite - пути к файлам
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', default='').split(',')), 1):
+    alias = f'replica_{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME' if 'sqlite3' in DATABASES['default']['ENGINE'] else 'HOST': (
+            replica.strip()),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', default='10'))
+
+if DATABASE_REPLICAS:
+    DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+    MIDDLEWARE.insert(1, 'api.middleware.ReplicaRoutingMiddleware')
+
+# Версии данных, пины реплик и токены хранятся в кеше
+# и должны быть видны всем процессам: в продакшене
+# нужен общий кеш (redis, memcached). С локальным кешем процесса
+# версий нет: списки, индексы и лента читаются из базы без ETag.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+RECIPE_FEED_CACHE_TIMEOUT = int(
+    os.getenv('RECIPE_FEED_CACHE_TIMEOUT', default='300'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -113,12 +155,33 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Закрытые файлы (списки покупок): вне MEDIA_ROOT, nginx их не раздаёт,
+# они отдаются только через вью с проверкой прав
+PRIVATE_MEDIA_ROOT = os.getenv(
+    'PRIVATE_MEDIA_ROOT', default=os.path.join(BASE_DIR, 'private'))
+
+SERVER_TIMING_WINDOW = int(os.getenv('SERVER_TIMING_WINDOW', default='1000'))
+
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', default='2'))
+
+ASYNC_READ_WORKERS = int(os.getenv('ASYNC_READ_WORKERS', default='16'))
+
+SHOPPING_LIST_JOB_TIMEOUT = int(
+    os.getenv('SHOPPING_LIST_JOB_TIMEOUT', default='3600'))
+
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', default='300'))
+
+TIMELINE_FANOUT_LIMIT = int(
+    os.getenv('TIMELINE_FANOUT_LIMIT', default='1000'))
+
+TIMELINE_BACKFILL = int(os.getenv('TIMELINE_BACKFILL', default='100'))
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
 
 }
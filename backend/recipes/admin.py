@@ -1,6 +1,44 @@
 from django.contrib import admin
+from django.contrib.admin.utils import NestedObjects
+from django.db import router, transaction
 
-from .models import Cart, Favorite, Ingredient, Recipe, RecipeIngredient, Tag
+from . import timeline
+from .counters import refresh
+from .models import (Cart, CartIngredient, Favorite, Ingredient,
+                     PopularRecipe, Recipe, RecipeIngredient, Tag)
+
+
+class RefreshCountersAdmin(admin.ModelAdmin):
+    """
+    Админка меняет строки в обход API: после сохранения и удаления
+    счётчики и суммы корзин затронутых строк пересчитываются.
+    Удаление учитывает и каскадно удаляемые объекты.
+    """
+
+    def collect(self, objs):
+        collector = NestedObjects(using=router.db_for_write(self.model))
+        collector.collect(objs)
+        return [
+            obj for instances in collector.data.values() for obj in instances
+        ]
+
+    def save_model(self, request, obj, form, change):
+        objs = [obj]
+        if change:
+            objs.append(self.model.objects.get(pk=obj.pk))
+        super().save_model(request, obj, form, change)
+        refresh(objs)
+
+    def delete_model(self, request, obj):
+        objs = self.collect([obj])
+        super().delete_model(request, obj)
+        refresh(objs)
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        objs = self.collect(list(queryset))
+        super().delete_queryset(request, queryset)
+        refresh(objs)
 
 
 @admin.register(Ingredient)
@@ -10,14 +48,20 @@ class IngredientAdmin(admin.ModelAdmin):
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'author')
+class RecipeAdmin(RefreshCountersAdmin):
+    list_display = ('id', 'name', 'author', 'count_favorites')
     list_filter = ('author', 'name', 'tags')
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change and obj.author_id:
+            timeline.fan_out(obj, obj.author.followers_count)
+
     def count_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
 
     count_favorites.short_description = 'Число добавлений в избранное'
+    count_favorites.admin_order_field = 'favorites_count'
 
 
 @admin.register(Tag)
@@ -26,16 +70,28 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(RecipeIngredient)
-class RecipeIngredientAdmin(admin.ModelAdmin):
+class RecipeIngredientAdmin(RefreshCountersAdmin):
     pass
 
 
 @admin.register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(RefreshCountersAdmin):
     list_display = ('id', 'user', 'recipe')
     empty_value_display = '-пусто-'
 
 
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
+class CartAdmin(RefreshCountersAdmin):
     pass
+
+
+@admin.register(CartIngredient)
+class CartIngredientAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'ingredient', 'amount')
+    list_filter = ('user',)
+
+
+@admin.register(PopularRecipe)
+class PopularRecipeAdmin(admin.ModelAdmin):
+    list_display = ('rank', 'recipe', 'score', 'favorites', 'carts',
+                    'computed_at')
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+from .versions import is_shared_cache
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Без общего кеша версий данных нет, и кеши по версии отключены.
+    """
+    if settings.DEBUG or is_shared_cache():
+        return []
+    return [Warning(
+        'Кеш по умолчанию локален для процесса: списки тегов '
+        'и ингредиентов, индексы и лента рецептов не кешируются '
+        'и читаются из базы на каждый запрос.',
+        hint='Укажите общий кеш в CACHE_BACKEND и CACHE_LOCATION '
+             '(redis, memcached).',
+        id='recipes.W001',
+    )]
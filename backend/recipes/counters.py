@@ -0,0 +1,85 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from users.models import Follow, User
+
+from .models import Cart, CartIngredient, Favorite, Recipe, RecipeIngredient
+
+# (модель, поле счётчика, связанная модель, внешний ключ на модель)
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'in_carts_count', Cart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+RECIPE_COUNTERS = {
+    Favorite: 'favorites_count',
+    Cart: 'in_carts_count',
+}
+
+
+def change_counter(model, pk, field, delta=1):
+    """
+    Атомарно меняет счётчик одной строки выражением F(),
+    без чтения текущего значения.
+    """
+    if delta:
+        model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+def change_counters(model, pks, field, delta=1):
+    """
+    То же для нескольких строк одним UPDATE.
+    """
+    if pks and delta:
+        model.objects.filter(pk__in=pks).update(**{field: F(field) + delta})
+
+
+def live_count(related, foreign_key):
+    return Coalesce(Subquery(
+        related.objects.filter(**{foreign_key: OuterRef('pk')})
+        .order_by().values(foreign_key)
+        .annotate(count=Count('pk')).values('count')
+    ), 0)
+
+
+def reconcile(check=False):
+    """
+    Сверяет счётчики с живыми данными и исправляет расхождения.
+    Возвращает словарь {'Модель.поле': число расходящихся строк}.
+    """
+    drift = {}
+    for model, field, related, foreign_key in COUNTERS:
+        actual = live_count(related, foreign_key)
+        stale = model.objects.annotate(actual=actual).exclude(
+            **{field: F('actual')}).values('pk')
+        drift[f'{model.__name__}.{field}'] = stale.count()
+        if not check and drift[f'{model.__name__}.{field}']:
+            model.objects.filter(pk__in=list(stale.values_list(
+                'pk', flat=True))).update(**{field: actual})
+    return drift
+
+
+def refresh(objs):
+    """
+    Пересчитывает по живым данным счётчики и суммы корзин, которые
+    зависят от объектов objs. Для изменений в обход API (админка),
+    где счётчики не меняются на месте.
+    """
+    affected = defaultdict(set)
+    for obj in objs:
+        for counter in COUNTERS:
+            if isinstance(obj, counter[2]):
+                affected[counter].add(getattr(obj, f'{counter[3]}_id'))
+    for (model, field, related, foreign_key), pks in affected.items():
+        model.objects.filter(pk__in=pks).update(
+            **{field: live_count(related, foreign_key)})
+    user_ids = {obj.user_id for obj in objs if isinstance(obj, Cart)}
+    recipe_ids = {
+        obj.recipe_id for obj in objs if isinstance(obj, RecipeIngredient)
+    }
+    if recipe_ids:
+        user_ids.update(Cart.objects.filter(
+            recipe_id__in=recipe_ids).values_list('user_id', flat=True))
+    CartIngredient.objects.rebuild(user_ids)
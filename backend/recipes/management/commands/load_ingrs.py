@@ -1,33 +1,101 @@
 import csv
+import json
 import os
+from itertools import islice
 
 from django.conf import settings
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from recipes.models import Ingredient
+from recipes.versions import bump_version
 
 DATA_ROOT = os.path.join(settings.BASE_DIR, 'data')
 
 
+def read_csv(file):
+    for row in csv.reader(file):
+        if row:
+            name, measurement_unit = row
+            yield name, measurement_unit
+
+
+def read_json(file):
+    for item in json.load(file):
+        yield item['name'], item['measurement_unit']
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
+
+
 class Command(BaseCommand):
     """
-    Импорт ингредиентов из CSV.
+    Импорт ингредиентов из CSV или JSON.
+    Строки вставляются пачками, уже существующие пропускаются
+    по ограничению 'ingredient uniq', так что повторный запуск
+    ничего не меняет.
     """
     help = 'loading ingredients from data in json or csv'
 
     def add_arguments(self, parser):
         parser.add_argument('filename', default='ingredients.csv', nargs='?',
                             type=str)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='only count rows that would be inserted')
+
+    @staticmethod
+    def batches(rows, size):
+        rows = iter(rows)
+        batch = list(islice(rows, size))
+        while batch:
+            yield batch
+            batch = list(islice(rows, size))
+
+    @staticmethod
+    def count_new(batch):
+        existing = set(Ingredient.objects.filter(
+            name__in={name for name, _ in batch}
+        ).values_list('name', 'measurement_unit'))
+        return sum(1 for row in batch if row not in existing)
 
     def handle(self, *args, **options):
+        filename = options['filename']
+        reader = READERS.get(os.path.splitext(filename)[1].lower())
+        if reader is None:
+            raise CommandError('Поддерживаются только файлы .csv и .json')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0')
         try:
-            with open(os.path.join(DATA_ROOT, options['filename']), 'r',
-                      encoding='utf-8') as f:
-                data = csv.reader(f)
-                for row in data:
-                    name, measurement_unit = row
-                    Ingredient.objects.get_or_create(
-                        name=name,
-                        measurement_unit=measurement_unit
+            with open(os.path.join(DATA_ROOT, filename), 'r',
+                      encoding='utf-8') as f, transaction.atomic():
+                before = Ingredient.objects.count()
+                seen = set()
+                total = new = 0
+                for batch in self.batches(reader(f), options['batch_size']):
+                    total += len(batch)
+                    batch = [row for row in batch if row not in seen]
+                    seen.update(batch)
+                    if options['dry_run']:
+                        new += self.count_new(batch)
+                        continue
+                    Ingredient.objects.bulk_create(
+                        (Ingredient(name=name,
+                                    measurement_unit=measurement_unit)
+                         for name, measurement_unit in batch),
+                        ignore_conflicts=True,
                     )
+                if not options['dry_run']:
+                    new = Ingredient.objects.count() - before
+                    if new:
+                        transaction.on_commit(
+                            lambda: bump_version('ingredients'))
         except FileNotFoundError:
             raise CommandError('Добавьте файл ingredients в директорию data')
+        except (ValueError, KeyError, TypeError) as error:
+            raise CommandError(f'Некорректный формат файла: {error}')
+        prefix = 'Будет добавлено' if options['dry_run'] else 'Добавлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}: {new}, пропущено: {total - new}'))
@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from recipes.models import Cart, Favorite, PopularRecipe
+
+
+class Command(BaseCommand):
+    """
+    Пересчёт рейтинга популярных рецептов за последние дни.
+    Рейтинг - взвешенная сумма добавлений в избранное и в корзину,
+    в таблицу попадают только первые --limit рецептов.
+    Строки без даты добавления (история до появления дат) не учитываются.
+    Запускается периодически, например из cron.
+    """
+    help = 'rank recipes by recent favorites and carts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7,
+                            help='size of the time window in days')
+        parser.add_argument('--limit', type=int, default=500,
+                            help='number of recipes kept in the ranking')
+        parser.add_argument('--favorite-weight', type=float, default=1.0)
+        parser.add_argument('--cart-weight', type=float, default=1.0)
+
+    @staticmethod
+    def recent_counts(model, since):
+        return dict(
+            model.objects.filter(added__isnull=False, added__gte=since)
+            .values('recipe').annotate(count=Count('id'))
+            .values_list('recipe', 'count').order_by()
+        )
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['limit'] < 1:
+            raise CommandError('--days и --limit должны быть больше 0')
+        now = timezone.now()
+        since = now - timedelta(days=options['days'])
+        favorites = self.recent_counts(Favorite, since)
+        carts = self.recent_counts(Cart, since)
+        scores = {
+            recipe_id: (
+                options['favorite_weight'] * favorites.get(recipe_id, 0)
+                + options['cart_weight'] * carts.get(recipe_id, 0)
+            )
+            for recipe_id in favorites.keys() | carts.keys()
+        }
+        ranking = sorted(
+            (recipe_id for recipe_id, score in scores.items() if score > 0),
+            key=lambda recipe_id: (-scores[recipe_id], -recipe_id),
+        )[:options['limit']]
+        with transaction.atomic():
+            PopularRecipe.objects.all().delete()
+            PopularRecipe.objects.bulk_create(
+                PopularRecipe(
+                    recipe_id=recipe_id,
+                    rank=rank,
+                    score=scores[recipe_id],
+                    favorites=favorites.get(recipe_id, 0),
+                    carts=carts.get(recipe_id, 0),
+                    computed_at=now,
+                )
+                for rank, recipe_id in enumerate(ranking, start=1)
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'В рейтинге рецептов: {len(ranking)}'))
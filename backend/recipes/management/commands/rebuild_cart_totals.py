@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import CartIngredient
+
+
+class Command(BaseCommand):
+    """
+    Пересчёт сумм ингредиентов в корзинах пользователей.
+    """
+    help = 'rebuild per-user shopping cart totals from the cart contents'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='only compare stored totals with the live aggregate')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    @staticmethod
+    def stored_totals():
+        return {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in CartIngredient.objects
+            .filter(amount__gt=0)
+            .values_list('user_id', 'ingredient_id', 'amount')
+            .order_by()
+        }
+
+    def handle(self, *args, **options):
+        live = CartIngredient.objects.live_totals()
+        stored = self.stored_totals()
+        drift = [
+            key for key in live.keys() | stored.keys()
+            if live.get(key) != stored.get(key)
+        ]
+        self.stdout.write(f'Расхождений: {len(drift)}')
+        if options['check']:
+            if drift:
+                raise CommandError('Суммы в корзинах не совпадают')
+            return
+        with transaction.atomic():
+            CartIngredient.objects.all().delete()
+            CartIngredient.objects.bulk_create(
+                (CartIngredient(user_id=user_id, ingredient_id=ingredient_id,
+                                amount=amount)
+                 for (user_id, ingredient_id), amount in live.items()),
+                batch_size=options['batch_size'],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано строк: {len(live)}'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.timeline import rebuild
+
+
+class Command(BaseCommand):
+    """
+    Перестроение лент подписок по текущим подпискам: для каждой
+    подписки на автора, рецепты которого раскладываются по лентам,
+    в ленту попадают его последние TIMELINE_BACKFILL рецептов.
+    Нужно после смены TIMELINE_FANOUT_LIMIT или массовой загрузки данных.
+    """
+    help = 'rebuild the following timelines from the current follows'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей в лентах: {created}'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.counters import reconcile
+
+
+class Command(BaseCommand):
+    """
+    Сверка денормализованных счётчиков рецептов и пользователей
+    с живыми данными и исправление расхождений.
+    """
+    help = 'repair favorites, cart, recipe and follower counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='only report counters that differ from the live data')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            drift = reconcile(check=options['check'])
+        for name, count in drift.items():
+            self.stdout.write(f'{name}: расхождений {count}')
+        if options['check'] and any(drift.values()):
+            raise CommandError('Счётчики не совпадают с данными')
+        if not options['check']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Исправлено строк: {sum(drift.values())}'))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.seeding import seed
+from recipes.versions import bump_version
+
+
+class Command(BaseCommand):
+    """
+    Наполнение базы синтетическими пользователями, рецептами,
+    подписками, избранным и корзинами.
+    """
+    help = 'seed the database with synthetic foodgram data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--ingredients', type=int, default=500,
+                            help='minimal size of the ingredient catalog')
+        parser.add_argument('--follows', type=int, default=10,
+                            help='average follows per user')
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='average favorites per user')
+        parser.add_argument('--carts', type=int, default=5,
+                            help='average recipes in cart per user')
+        parser.add_argument('--days', type=int, default=365,
+                            help='spread publication dates over N days')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--random-seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше 0')
+        if min(options['users'], options['recipes'], options['days']) < 0:
+            raise CommandError('Количество не может быть отрицательным')
+        if options['recipes'] and not options['users']:
+            raise CommandError('Для рецептов нужен хотя бы один автор')
+        with transaction.atomic():
+            counts = seed(
+                users=options['users'],
+                recipes=options['recipes'],
+                ingredients=options['ingredients'],
+                follows=options['follows'],
+                favorites=options['favorites'],
+                carts=options['carts'],
+                days=options['days'],
+                batch_size=options['batch_size'],
+                random_seed=options['random_seed'],
+            )
+            # Новые теги и ингредиенты меняют версии справочников,
+            # а вместе с ними и ключи кэша ленты; новые рецепты -
+            # состав для подбора по ингредиентам
+            transaction.on_commit(
+                lambda: bump_version(
+                    'tags', 'ingredients', 'recipe_ingredients'))
+        self.stdout.write(self.style.SUCCESS(', '.join(
+            f'{name}: {count}' for name, count in counts.items())))
@@ -0,0 +1,43 @@
+# Generated by Django 4.0.2 on 2026-10-18 03:08
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def live_count(model, foreign_key):
+    return Coalesce(models.Subquery(
+        model.objects.filter(**{foreign_key: models.OuterRef('pk')})
+        .order_by().values(foreign_key)
+        .annotate(count=models.Count('pk')).values('count')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Recipe.objects.update(
+        favorites_count=live_count(
+            apps.get_model('recipes', 'Favorite'), 'recipe'),
+        in_carts_count=live_count(
+            apps.get_model('recipes', 'Cart'), 'recipe'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_recipe_pub_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Число добавлений в избранное'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Число добавлений в корзину'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
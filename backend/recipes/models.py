@@ -1,6 +1,14 @@
+import uuid
+
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import (IntegrityError, connections, models, router,
+                       transaction)
+from django.db.models import Exists, OuterRef, Prefetch, Sum, Value
+from django.utils import timezone
+from users.models import CounterFieldsMixin, Follow
+
+from .search import search_queryset
 
 User = get_user_model()
 
@@ -53,7 +61,50 @@ class Tag(models.Model):
         return self.name
 
 
-class Recipe(models.Model):
+class RecipeQuerySet(models.QuerySet):
+
+    def search(self, query):
+        """
+        Полнотекстовый поиск по названию и описанию,
+        самые релевантные рецепты первыми.
+        """
+        return search_queryset(
+            self, query, connections[self.db].vendor
+        ).order_by('-search_rank', '-pub_date', '-id')
+
+    def with_user_data(self, user):
+        """
+        Рецепты со всеми данными для RecipeReadSerializer.
+        Флаги пользователя считаются аннотациями, теги, ингредиенты
+        и автор подгружаются заранее: число запросов не зависит
+        от количества рецептов.
+        """
+        if user.is_authenticated:
+            is_favorited = Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')))
+            is_in_shopping_cart = Exists(Cart.objects.filter(
+                user=user, recipe=OuterRef('pk')))
+            is_subscribed = Exists(Follow.objects.filter(
+                user=user, author=OuterRef('pk')))
+        else:
+            is_favorited = is_in_shopping_cart = is_subscribed = Value(False)
+        return self.annotate(
+            is_favorited=is_favorited,
+            is_in_shopping_cart=is_in_shopping_cart,
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'author',
+                queryset=User.objects.annotate(is_subscribed=is_subscribed)
+            ),
+            Prefetch(
+                'RecipeIngredient',
+                queryset=RecipeIngredient.objects.select_related('ingredient')
+            ),
+        )
+
+
+class Recipe(CounterFieldsMixin, models.Model):
     tags = models.ManyToManyField(
         Tag,
         related_name='recipes',
@@ -82,6 +133,20 @@ class Recipe(models.Model):
         null=True,
         blank=True
     )
+    image_thumbnail = models.ImageField(
+        'Миниатюра',
+        upload_to='images/thumbnail/',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+    image_medium = models.ImageField(
+        'Картинка среднего размера',
+        upload_to='images/medium/',
+        null=True,
+        blank=True,
+        editable=False,
+    )
     text = models.TextField(
         'Описание рецепта'
     )
@@ -96,11 +161,38 @@ class Recipe(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    favorites_count = models.IntegerField(
+        'Число добавлений в избранное',
+        default=0,
+        editable=False,
+    )
+    in_carts_count = models.IntegerField(
+        'Число добавлений в корзину',
+        default=0,
+        editable=False,
+    )
+
+    counter_fields = ('favorites_count', 'in_carts_count')
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_idx',
+            ),
+            models.Index(
+                fields=['-favorites_count', '-in_carts_count', '-id'],
+                name='recipe_popularity_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -138,6 +230,92 @@ class RecipeIngredient(models.Model):
         ]
 
 
+class UserRecipeQuerySet(models.QuerySet):
+    """
+    Добавление и удаление рецептов пользователя.
+    Повторы и несуществующие рецепты пропускаются без ошибок
+    целостности, поэтому одновременные клики не конфликтуют.
+    С RETURNING (PostgreSQL, SQLite 3.35+) - одним запросом,
+    иначе - отдельным запросом на каждый рецепт.
+    """
+
+    @staticmethod
+    def returning_ids(connection, sql, params):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def add_each(self, connection, user_id, recipe_ids):
+        added = []
+        for recipe_id in Recipe.objects.using(connection.alias).filter(
+                id__in=recipe_ids).values_list('id', flat=True):
+            try:
+                with transaction.atomic(using=connection.alias):
+                    self.using(connection.alias).create(
+                        user_id=user_id, recipe_id=recipe_id)
+            except IntegrityError:
+                continue
+            added.append(recipe_id)
+        return added
+
+    def remove_each(self, connection, user_id, recipe_ids):
+        rows = self.using(connection.alias).filter(user_id=user_id)
+        return [
+            recipe_id for recipe_id in recipe_ids
+            if rows.filter(recipe_id=recipe_id).delete()[0]
+        ]
+
+    def add(self, user_id, recipe_ids):
+        """
+        Возвращает id рецептов, которые действительно добавлены.
+        """
+        recipe_ids = list(set(recipe_ids))
+        if not recipe_ids:
+            return []
+        connection = connections[router.db_for_write(self.model)]
+        if not connection.features.can_return_columns_from_insert:
+            return self.add_each(connection, user_id, recipe_ids)
+        quote = connection.ops.quote_name
+        opts = self.model._meta
+        added = opts.get_field('added')
+        sql = (
+            f'INSERT INTO {quote(opts.db_table)} '
+            f'({quote(opts.get_field("user").column)}, '
+            f'{quote(opts.get_field("recipe").column)}, '
+            f'{quote(added.column)}) '
+            f'SELECT %s, {quote(Recipe._meta.pk.column)}, %s '
+            f'FROM {quote(Recipe._meta.db_table)} '
+            f'WHERE {quote(Recipe._meta.pk.column)} IN '
+            f'({", ".join(["%s"] * len(recipe_ids))}) '
+            f'ON CONFLICT DO NOTHING '
+            f'RETURNING {quote(opts.get_field("recipe").column)}'
+        )
+        now = added.get_db_prep_value(timezone.now(), connection)
+        return self.returning_ids(
+            connection, sql, [user_id, now, *recipe_ids])
+
+    def remove(self, user_id, recipe_ids):
+        """
+        Возвращает id рецептов, которые действительно удалены.
+        """
+        recipe_ids = list(set(recipe_ids))
+        if not recipe_ids:
+            return []
+        connection = connections[router.db_for_write(self.model)]
+        if not connection.features.can_return_columns_from_insert:
+            return self.remove_each(connection, user_id, recipe_ids)
+        quote = connection.ops.quote_name
+        opts = self.model._meta
+        recipe = quote(opts.get_field('recipe').column)
+        sql = (
+            f'DELETE FROM {quote(opts.db_table)} '
+            f'WHERE {quote(opts.get_field("user").column)} = %s '
+            f'AND {recipe} IN ({", ".join(["%s"] * len(recipe_ids))}) '
+            f'RETURNING {recipe}'
+        )
+        return self.returning_ids(connection, sql, [user_id, *recipe_ids])
+
+
 class Cart(models.Model):
     user = models.ForeignKey(
         User,
@@ -151,6 +329,14 @@ class Cart(models.Model):
         related_name='cart',
         verbose_name='Рецепт',
     )
+    added = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+        null=True,
+        db_index=True,
+    )
+
+    objects = UserRecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-id']
@@ -177,6 +363,14 @@ class Favorite(models.Model):
         related_name='favorites',
         verbose_name='Рецепт',
     )
+    added = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+        null=True,
+        db_index=True,
+    )
+
+    objects = UserRecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ['-id']
@@ -188,3 +382,276 @@ class Favorite(models.Model):
                 name='unique_favorites'
             )
         ]
+
+
+class CartIngredientQuerySet(models.QuerySet):
+    upsert_batch_size = 500
+
+    def upsert_amounts(self, connection, rows):
+        """
+        Одним запросом на пачку вставляет строки (user_id, ingredient_id,
+        delta) или прибавляет delta к существующим (ON CONFLICT DO UPDATE,
+        PostgreSQL и SQLite 3.24+). Прибавление атомарно, поэтому
+        одновременное удаление строки не теряет изменение.
+        """
+        quote = connection.ops.quote_name
+        opts = self.model._meta
+        table = quote(opts.db_table)
+        user = quote(opts.get_field('user').column)
+        ingredient = quote(opts.get_field('ingredient').column)
+        amount = quote(opts.get_field('amount').column)
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), self.upsert_batch_size):
+                batch = rows[start:start + self.upsert_batch_size]
+                cursor.execute(
+                    f'INSERT INTO {table} ({user}, {ingredient}, {amount}) '
+                    f'VALUES {", ".join(["(%s, %s, %s)"] * len(batch))} '
+                    f'ON CONFLICT ({user}, {ingredient}) DO UPDATE '
+                    f'SET {amount} = {table}.{amount} + EXCLUDED.{amount}',
+                    [value for row in batch for value in row],
+                )
+
+    def apply_amounts(self, user_ids, amounts):
+        """
+        Прибавляет к суммам пользователей количества ингредиентов
+        из словаря {ingredient_id: delta}.
+        Недостающие строки создаются, обнулившиеся удаляются.
+        """
+        amounts = {
+            ingredient_id: delta
+            for ingredient_id, delta in amounts.items() if delta
+        }
+        if not amounts:
+            return
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        connection = connections[router.db_for_write(self.model)]
+        with transaction.atomic(using=connection.alias):
+            self.upsert_amounts(connection, [
+                (user_id, ingredient_id, delta)
+                for user_id in user_ids
+                for ingredient_id, delta in amounts.items()
+            ])
+            self.using(connection.alias).filter(
+                user_id__in=user_ids, ingredient_id__in=amounts,
+                amount__lte=0,
+            ).delete()
+
+    def apply_recipes(self, user_ids, recipe_ids, sign=1):
+        """
+        Добавляет (sign=1) или вычитает (sign=-1) ингредиенты рецептов.
+        """
+        amounts = RecipeIngredient.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values('ingredient_id').annotate(
+            total=Sum('amount')
+        ).values_list('ingredient_id', 'total').order_by()
+        self.apply_amounts(
+            user_ids,
+            {ingredient_id: sign * amount
+             for ingredient_id, amount in amounts}
+        )
+
+    def apply_recipe(self, user_ids, recipe_id, sign=1):
+        self.apply_recipes(user_ids, [recipe_id], sign)
+
+    @staticmethod
+    def live_totals(user_ids=None):
+        """
+        Суммы по содержимому корзин {(user_id, ingredient_id): amount}.
+        """
+        amounts = RecipeIngredient.objects.filter(recipe__cart__isnull=False)
+        if user_ids is not None:
+            amounts = amounts.filter(recipe__cart__user__in=user_ids)
+        return {
+            (user_id, ingredient_id): amount
+            for user_id, ingredient_id, amount in amounts
+            .values('recipe__cart__user', 'ingredient')
+            .annotate(total=Sum('amount'))
+            .values_list('recipe__cart__user', 'ingredient', 'total')
+            .order_by()
+        }
+
+    def rebuild(self, user_ids):
+        """
+        Пересчитывает суммы пользователей по содержимому их корзин.
+        """
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        self.filter(user_id__in=user_ids).delete()
+        self.bulk_create(
+            self.model(user_id=user_id, ingredient_id=ingredient_id,
+                       amount=amount)
+            for (user_id, ingredient_id), amount
+            in self.live_totals(user_ids).items()
+        )
+
+
+class CartIngredient(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredients',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredients',
+        verbose_name='Ингредиент',
+    )
+    amount = models.IntegerField(
+        'Количество',
+        default=0,
+    )
+
+    objects = CartIngredientQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['ingredient__name']
+        verbose_name = 'Ингредиент в корзине'
+        verbose_name_plural = 'Ингредиенты в корзине'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient',),
+                name='unique_cart_ingredient'
+            )
+        ]
+
+
+class PopularRecipe(models.Model):
+    """
+    Предрасчитанный рейтинг популярности за период.
+    Заполняется командой rank_popular_recipes.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='popularity',
+        verbose_name='Рецепт',
+    )
+    rank = models.PositiveIntegerField(
+        'Место',
+        db_index=True,
+    )
+    score = models.FloatField(
+        'Рейтинг',
+    )
+    favorites = models.PositiveIntegerField(
+        'Добавлений в избранное за период',
+    )
+    carts = models.PositiveIntegerField(
+        'Добавлений в корзину за период',
+    )
+    computed_at = models.DateTimeField(
+        'Время расчёта',
+    )
+
+    class Meta:
+        ordering = ['rank']
+        verbose_name = 'Популярный рецепт'
+        verbose_name_plural = 'Популярные рецепты'
+
+    def __str__(self):
+        return f'{self.rank}. {self.recipe}'
+
+
+class TimelineEntry(models.Model):
+    """
+    Рецепт в ленте подписок пользователя.
+    Строки создаются при публикации рецепта для всех подписчиков
+    автора (fan-out on write) и при новой подписке; рецепты авторов
+    с очень большим числом подписчиков сюда не пишутся и читаются
+    при запросе ленты.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+    pub_date = models.DateTimeField(
+        'Дата публикации рецепта',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_timeline_entry',
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='timeline_user_pub_date_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.recipe}'
+
+
+class ShoppingListJob(models.Model):
+    """
+    Фоновая выгрузка списка покупок. Состояние хранится в базе
+    и видно всем процессам; файл лежит в закрытом хранилище.
+    """
+    PENDING = 'pending'
+    READY = 'ready'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, PENDING),
+        (READY, READY),
+        (FAILED, FAILED),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4,
+                          editable=False)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_jobs',
+        verbose_name='Пользователь',
+    )
+    format = models.CharField('Формат', max_length=3)
+    file = models.CharField('Файл', max_length=255)
+    status = models.CharField(
+        'Статус',
+        max_length=max(len(status) for status, _ in STATUS_CHOICES),
+        choices=STATUS_CHOICES,
+        default=PENDING,
+    )
+    created = models.DateTimeField(
+        'Дата создания',
+        auto_now_add=True,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'Выгрузка списка покупок'
+        verbose_name_plural = 'Выгрузки списков покупок'
+
+    def __str__(self):
+        return f'{self.user} - {self.file}'
@@ -0,0 +1,151 @@
+import re
+
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+TABLE = 'recipes_recipe'
+FTS_TABLE = 'recipes_recipe_fts'
+# Совпадение в названии важнее совпадения в описании
+NAME_WEIGHT = 10.0
+TEXT_WEIGHT = 1.0
+
+POSTGRESQL_INSTALL = (
+    f"""
+    ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('russian', coalesce(text, '')), 'B')
+    ) STORED
+    """,
+    f"""
+    CREATE INDEX IF NOT EXISTS recipe_search_idx
+    ON {TABLE} USING GIN (search_vector)
+    """,
+)
+POSTGRESQL_UNINSTALL = (
+    'DROP INDEX IF EXISTS recipe_search_idx',
+    f'ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector',
+)
+
+SQLITE_TRIGGERS = {
+    f'{FTS_TABLE}_insert': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+        AFTER INSERT ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE} (rowid, name, text)
+            VALUES (new.id, new.name, new.text);
+        END
+    """,
+    f'{FTS_TABLE}_delete': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+        AFTER DELETE ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name, text)
+            VALUES ('delete', old.id, old.name, old.text);
+        END
+    """,
+    f'{FTS_TABLE}_update': f"""
+        CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+        AFTER UPDATE OF name, text ON {TABLE} BEGIN
+            INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name, text)
+            VALUES ('delete', old.id, old.name, old.text);
+            INSERT INTO {FTS_TABLE} (rowid, name, text)
+            VALUES (new.id, new.name, new.text);
+        END
+    """,
+}
+
+
+def install(connection):
+    """
+    Создаёт полнотекстовый индекс рецептов.
+    PostgreSQL - вычисляемая колонка tsvector с GIN-индексом,
+    SQLite - таблица FTS5 над recipes_recipe, которую ведут триггеры.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for sql in POSTGRESQL_INSTALL:
+                cursor.execute(sql)
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"name, text, content='{TABLE}', content_rowid='id')")
+            install_triggers(cursor)
+
+
+def install_triggers(cursor):
+    for sql in SQLITE_TRIGGERS.values():
+        cursor.execute(sql)
+    cursor.execute(
+        f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def uninstall(connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for sql in POSTGRESQL_UNINSTALL:
+                cursor.execute(sql)
+        elif connection.vendor == 'sqlite':
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def restore_triggers(connection):
+    """
+    SQLite при изменении схемы пересоздаёт таблицу рецептов,
+    и её триггеры пропадают. После миграций недостающие триггеры
+    создаются заново, а индекс перестраивается.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' "
+            "AND name = %s", [FTS_TABLE])
+        if cursor.fetchone() is None:
+            return
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND tbl_name = %s", [TABLE])
+        if set(SQLITE_TRIGGERS) - {name for name, in cursor.fetchall()}:
+            install_triggers(cursor)
+
+
+def fts_query(query):
+    """
+    Запрос FTS5 из слов строки поиска: все слова, каждое как префикс.
+    Операторы FTS5 из пользовательского ввода не пропускаются.
+    """
+    return ' '.join(f'"{word}"*' for word in re.findall(r'\w+', query))
+
+
+def search_queryset(queryset, query, vendor):
+    """
+    Рецепты, подходящие под строку поиска, с релевантностью
+    в аннотации search_rank (больше - лучше).
+    """
+    if vendor == 'postgresql':
+        tsquery = "websearch_to_tsquery('russian', %s)"
+        matches = RawSQL(
+            f'{TABLE}.search_vector @@ {tsquery}', (query,),
+            output_field=BooleanField())
+        rank = RawSQL(
+            f'ts_rank({TABLE}.search_vector, {tsquery})', (query,),
+            output_field=FloatField())
+    elif vendor == 'sqlite':
+        query = fts_query(query)
+        if not query:
+            return queryset.none()
+        matches = RawSQL(
+            f'{TABLE}.id IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)', (query,),
+            output_field=BooleanField())
+        rank = RawSQL(
+            f'(SELECT -bm25({FTS_TABLE}, {NAME_WEIGHT}, {TEXT_WEIGHT}) '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'AND rowid = {TABLE}.id)', (query,),
+            output_field=FloatField())
+    else:
+        return queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+        ).annotate(search_rank=Value(0.0))
+    return queryset.filter(matches).annotate(search_rank=rank)
@@ -0,0 +1,166 @@
+import random
+import uuid
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.utils import timezone
+from users.models import Follow, User
+
+from . import timeline
+from .counters import reconcile
+from .models import (Cart, CartIngredient, Favorite, Ingredient, Recipe,
+                     RecipeIngredient, Tag)
+
+DEFAULT_TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+WORDS = (
+    'суп', 'салат', 'пирог', 'каша', 'паста', 'рагу', 'запеканка', 'омлет',
+    'плов', 'котлеты', 'блины', 'сырники', 'борщ', 'гуляш', 'ризотто',
+)
+ADJECTIVES = (
+    'домашний', 'быстрый', 'острый', 'летний', 'праздничный', 'постный',
+    'сытный', 'лёгкий', 'бабушкин', 'овощной',
+)
+
+
+def zipf_weights(count, exponent=1.1):
+    """
+    Веса с длинным хвостом: немногие авторы, ингредиенты
+    и рецепты встречаются намного чаще остальных.
+    """
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+def sample_unique(generator, population, weights, count):
+    chosen = set()
+    count = min(count, len(population))
+    while len(chosen) < count:
+        chosen.update(generator.choices(
+            population, weights, k=count - len(chosen)))
+    return chosen
+
+
+def seed(users=100, recipes=1000, ingredients=500, follows=10, favorites=20,
+         carts=5, days=365, batch_size=1000, random_seed=0):
+    """
+    Наполняет базу синтетическими данными через bulk-вставки.
+    Ингредиенты и теги берутся из базы, недостающие создаются.
+    Возвращает словарь с количеством созданных объектов.
+    """
+    generator = random.Random(random_seed)
+    run = uuid.uuid4().hex[:8]
+    now = timezone.now()
+
+    tags = list(Tag.objects.all())
+    if not tags:
+        tags = Tag.objects.bulk_create(
+            Tag(name=name, color=color, slug=slug)
+            for name, color, slug in DEFAULT_TAGS
+        )
+    catalog = list(Ingredient.objects.values_list('id', flat=True))
+    if len(catalog) < ingredients:
+        Ingredient.objects.bulk_create(
+            (Ingredient(name=f'ингредиент {run} {number}',
+                        measurement_unit='г')
+             for number in range(ingredients - len(catalog))),
+            batch_size=batch_size,
+        )
+        catalog = list(Ingredient.objects.values_list('id', flat=True))
+    generator.shuffle(catalog)
+    ingredient_weights = zipf_weights(len(catalog))
+
+    created_users = User.objects.bulk_create(
+        (User(username=f'seed_{run}_{number}',
+              email=f'seed_{run}_{number}@example.com',
+              first_name='Имя', last_name='Фамилия', password='!')
+         for number in range(users)),
+        batch_size=batch_size,
+    )
+    user_ids = [user.id for user in created_users]
+    author_weights = zipf_weights(len(user_ids))
+
+    created_recipes = Recipe.objects.bulk_create(
+        (Recipe(
+            author_id=generator.choices(user_ids, author_weights)[0],
+            name=(f'{generator.choice(ADJECTIVES)} '
+                  f'{generator.choice(WORDS)} {number}'),
+            text=' '.join(generator.choices(WORDS + ADJECTIVES, k=60)),
+            cooking_time=generator.randint(5, 180),
+        ) for number in range(recipes)),
+        batch_size=batch_size,
+    )
+    for recipe in created_recipes:
+        recipe.pub_date = now - timedelta(
+            seconds=generator.randint(0, days * 24 * 60 * 60))
+    Recipe.objects.bulk_update(
+        created_recipes, ['pub_date'], batch_size=batch_size)
+    recipe_ids = [recipe.id for recipe in created_recipes]
+
+    tag_ids = [tag.id for tag in tags]
+    Recipe.tags.through.objects.bulk_create(
+        (Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+         for recipe_id in recipe_ids
+         for tag_id in generator.sample(
+             tag_ids, generator.randint(1, min(3, len(tag_ids))))),
+        batch_size=batch_size,
+    )
+    RecipeIngredient.objects.bulk_create(
+        (RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                          amount=generator.randint(1, 500))
+         for recipe_id in recipe_ids
+         for ingredient_id in sample_unique(
+             generator, catalog, ingredient_weights,
+             generator.randint(3, 15))),
+        batch_size=batch_size,
+    )
+
+    recipe_weights = zipf_weights(len(recipe_ids), exponent=0.8)
+    popular_recipes = recipe_ids[:]
+    generator.shuffle(popular_recipes)
+
+    def user_rows(model, per_user, population, weights, field,
+                  exclude_self=False):
+        return model.objects.bulk_create(
+            (model(user_id=user_id, **{field: target})
+             for user_id in user_ids
+             for target in sample_unique(
+                 generator, population, weights,
+                 generator.randint(0, per_user * 2))
+             if not (exclude_self and target == user_id)),
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+
+    counts = {
+        'users': len(user_ids),
+        'recipes': len(recipe_ids),
+        'follows': len(user_rows(
+            Follow, follows, user_ids, author_weights, 'author_id',
+            exclude_self=True)),
+        'favorites': len(user_rows(
+            Favorite, favorites, popular_recipes, recipe_weights,
+            'recipe_id')),
+        'carts': len(user_rows(
+            Cart, carts, popular_recipes, recipe_weights, 'recipe_id')),
+    }
+
+    totals = RecipeIngredient.objects.filter(
+        recipe__cart__user__in=user_ids
+    ).values('recipe__cart__user', 'ingredient').annotate(
+        total=Sum('amount')
+    ).order_by()
+    CartIngredient.objects.bulk_create(
+        (CartIngredient(user_id=row['recipe__cart__user'],
+                        ingredient_id=row['ingredient'],
+                        amount=row['total'])
+         for row in totals.iterator()),
+        batch_size=batch_size,
+    )
+    # Счётчики пересчитываются разом: bulk-вставки их не обновляют.
+    # Ленты подписок строятся после них, по числу подписчиков
+    reconcile()
+    timeline.rebuild()
+    return counts
@@ -0,0 +1,33 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .models import Ingredient, Recipe, RecipeIngredient, Tag
+from .search import restore_triggers
+from .versions import bump_version
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    # Версия меняется после коммита, иначе другой процесс может
+    # успеть закешировать старые данные под новой версией
+    transaction.on_commit(lambda: bump_version('tags'))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def bump_ingredients_version(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version('ingredients'))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def bump_recipe_ingredients_version(sender, **kwargs):
+    # Ингредиенты рецепта из API создаются bulk_create уже после
+    # сохранения рецепта, поэтому версия меняется после коммита
+    transaction.on_commit(lambda: bump_version('recipe_ingredients'))
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    if sender.label == 'recipes':
+        restore_triggers(connections[using])
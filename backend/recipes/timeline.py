@@ -0,0 +1,169 @@
+from heapq import merge
+
+from django.conf import settings
+from django.db.models import Q
+from users.models import Follow, User
+
+from .models import Recipe, TimelineEntry
+
+BATCH_SIZE = 1000
+
+
+def is_fanned_out(followers_count):
+    """
+    Рецепты автора раскладываются по лентам, пока подписчиков
+    не больше TIMELINE_FANOUT_LIMIT; рецепты популярных авторов
+    читаются при запросе ленты.
+    """
+    return followers_count <= settings.TIMELINE_FANOUT_LIMIT
+
+
+def fan_out(recipe, followers_count):
+    """
+    Добавляет новый рецепт в ленты подписчиков автора.
+    """
+    if not is_fanned_out(followers_count):
+        return
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, recipe_id=recipe.id,
+                          author_id=recipe.author_id,
+                          pub_date=recipe.pub_date)
+            for user_id in Follow.objects.filter(
+                author_id=recipe.author_id).values_list(
+                    'user_id', flat=True).iterator()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def latest_recipes(author_id):
+    return Recipe.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id').values_list(
+            'id', 'pub_date')[:settings.TIMELINE_BACKFILL]
+
+
+def backfill(user_id, author):
+    """
+    Новая подписка: последние TIMELINE_BACKFILL рецептов автора
+    попадают в ленту подписчика.
+    """
+    if not is_fanned_out(author.followers_count):
+        return
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, recipe_id=recipe_id,
+                          author_id=author.id, pub_date=pub_date)
+            for recipe_id, pub_date in latest_recipes(author.id)
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def became_fanned_out(author_id, removed):
+    """
+    Отписка опустила число подписчиков автора до TIMELINE_FANOUT_LIMIT:
+    его рецепты перестают читаться при запросе ленты.
+    """
+    followers_count = User.objects.values_list(
+        'followers_count', flat=True).get(pk=author_id)
+    return (is_fanned_out(followers_count)
+            and not is_fanned_out(followers_count + removed))
+
+
+def refill(author_id):
+    """
+    Автор перестал быть популярным: рецепты, опубликованные, пока
+    они читались при запросе ленты, в ленты не попали. Последние
+    TIMELINE_BACKFILL рецептов раскладываются по лентам всех
+    подписчиков, уже разложенные пропускаются.
+    """
+    recipes = list(latest_recipes(author_id))
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, recipe_id=recipe_id,
+                          author_id=author_id, pub_date=pub_date)
+            for user_id in Follow.objects.filter(
+                author_id=author_id).values_list(
+                    'user_id', flat=True).iterator()
+            for recipe_id, pub_date in recipes
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def forget(user_id, author_id):
+    """
+    Отписка: рецепты автора уходят из ленты подписчика.
+    """
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def rebuild():
+    """
+    Заполняет ленты заново по текущим подпискам, как при backfill.
+    Возвращает число записей.
+    """
+    TimelineEntry.objects.all().delete()
+    authors = User.objects.filter(
+        following__isnull=False,
+        followers_count__lte=settings.TIMELINE_FANOUT_LIMIT,
+    ).distinct().values_list('id', flat=True)
+    created = 0
+    for author_id in authors.iterator():
+        recipes = list(latest_recipes(author_id))
+        entries = [
+            TimelineEntry(user_id=user_id, recipe_id=recipe_id,
+                          author_id=author_id, pub_date=pub_date)
+            for user_id in Follow.objects.filter(
+                author_id=author_id).values_list('user_id', flat=True)
+            for recipe_id, pub_date in recipes
+        ]
+        TimelineEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+        created += len(entries)
+    return created
+
+
+def pulled(user_id):
+    """
+    Рецепты популярных авторов из подписок пользователя.
+    """
+    return Recipe.objects.filter(author__in=Follow.objects.filter(
+        user_id=user_id,
+        author__followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).values('author_id'))
+
+
+def after(field, position):
+    if position is None:
+        return Q()
+    pub_date, recipe_id = position
+    return Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, **{
+        f'{field}__lt': recipe_id})
+
+
+def read(user_id, limit, position=None):
+    """
+    Страница ленты подписок: до limit пар (pub_date, recipe_id)
+    новее-первыми, строго после позиции position.
+    Записи ленты сливаются с рецептами популярных авторов, которые
+    читаются напрямую по индексу (author, -pub_date, -id). Берётся по
+    limit строк из каждого источника: этого достаточно для первых
+    limit строк объединения. Рецепт, попавший в ленту до того, как
+    автор стал популярным, есть в обоих источниках и выводится один раз.
+    Когда автор перестаёт быть популярным, refill раскладывает
+    его рецепты по лентам.
+    """
+    entries = TimelineEntry.objects.filter(
+        after('recipe_id', position), user_id=user_id,
+    ).order_by('-pub_date', '-recipe_id').values_list(
+        'pub_date', 'recipe_id')[:limit]
+    recipes = pulled(user_id).filter(after('id', position)).order_by(
+        '-pub_date', '-id').values_list('pub_date', 'id')[:limit]
+    rows = list(merge(list(entries), list(recipes), reverse=True))
+    return [
+        row for index, row in enumerate(rows)
+        if not index or row != rows[index - 1]
+    ][:limit]
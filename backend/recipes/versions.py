@@ -0,0 +1,88 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+KEY = 'version:{}'
+
+
+def is_shared_cache():
+    """
+    Кеш по умолчанию общий для всех процессов (не локальный кеш процесса).
+    """
+    return (settings.CACHES['default']['BACKEND']
+            not in settings.LOCAL_CACHE_BACKENDS)
+
+
+def get_version(name):
+    """
+    Текущая версия набора данных.
+    Хранится в кеше Django, поэтому при общем кеше (redis, memcached)
+    видна всем процессам. Если ключ вытеснен, версия начинается заново
+    со значения на основе времени и не совпадает со старыми.
+    Без общего кеша версий нет: возвращается None, и кеши по версии
+    не используются.
+    """
+    if not is_shared_cache():
+        return None
+    key = KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(*names):
+    if not is_shared_cache():
+        return
+    for name in names:
+        key = KEY.format(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+
+
+def get_versions(names):
+    """
+    Версии нескольких наборов данных за одно обращение к кешу.
+    Без общего кеша - None.
+    """
+    if not is_shared_cache():
+        return None
+    keys = {KEY.format(name): name for name in names}
+    versions = cache.get_many(keys)
+    missing = keys.keys() - versions.keys()
+    if missing:
+        for key in missing:
+            cache.add(key, time.time_ns(), timeout=None)
+        versions.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+async def aget_version(name):
+    """
+    То же, что get_version, для async-вью.
+    """
+    if not is_shared_cache():
+        return None
+    key = KEY.format(name)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+async def aget_versions(names):
+    if not is_shared_cache():
+        return None
+    keys = {KEY.format(name): name for name in names}
+    versions = await cache.aget_many(keys)
+    missing = keys.keys() - versions.keys()
+    if missing:
+        for key in missing:
+            await cache.aadd(key, time.time_ns(), timeout=None)
+        versions.update(await cache.aget_many(missing))
+    return {keys[key]: version for key, version in versions.items()}
@@ -1,14 +1,50 @@
+from collections import Counter
+
 from django.contrib import admin
+from django.db import transaction
+from recipes import timeline
+from recipes.admin import RefreshCountersAdmin
 from users.models import Follow, User
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(RefreshCountersAdmin):
     list_display = ('id', 'username', 'email',
-                    'first_name', 'last_name', 'role')
+                    'first_name', 'last_name', 'role',
+                    'recipes_count', 'followers_count')
     list_filter = ('username', 'email')
 
 
 @admin.register(Follow)
-class FollowAdmin(admin.ModelAdmin):
-    pass
+class FollowAdmin(RefreshCountersAdmin):
+
+    @staticmethod
+    def unfollowed(follows):
+        """
+        Ленты после удаления подписок (user_id, author_id), когда
+        счётчики подписчиков уже пересчитаны.
+        """
+        removed = Counter()
+        for user_id, author_id in follows:
+            timeline.forget(user_id, author_id)
+            removed[author_id] += 1
+        for author_id, count in removed.items():
+            if timeline.became_fanned_out(author_id, count):
+                timeline.refill(author_id)
+
+    def save_model(self, request, obj, form, change):
+        old = change and Follow.objects.get(pk=obj.pk)
+        super().save_model(request, obj, form, change)
+        if old:
+            self.unfollowed([(old.user_id, old.author_id)])
+        timeline.backfill(obj.user_id, User.objects.get(pk=obj.author_id))
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        self.unfollowed([(obj.user_id, obj.author_id)])
+
+    @transaction.atomic
+    def delete_queryset(self, request, queryset):
+        follows = list(queryset.values_list('user_id', 'author_id'))
+        super().delete_queryset(request, queryset)
+        self.unfollowed(follows)
@@ -0,0 +1,44 @@
+# Generated by Django 4.0.2 on 2026-10-18 03:08
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def live_count(model, foreign_key):
+    return Coalesce(models.Subquery(
+        model.objects.filter(**{foreign_key: models.OuterRef('pk')})
+        .order_by().values(foreign_key)
+        .annotate(count=models.Count('pk')).values('count')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    User.objects.update(
+        recipes_count=live_count(
+            apps.get_model('recipes', 'Recipe'), 'author'),
+        followers_count=live_count(
+            apps.get_model('users', 'Follow'), 'author'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('recipes', '0006_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Число подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Число рецептов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]